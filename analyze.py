@@ -1,13 +1,27 @@
 import os
+import sys
+import csv
+import numpy as np
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
-from time import sleep, strftime, gmtime
+from time import strftime, gmtime
 from utils.filter_edgelist import filter_out_original, filter_out_outsiders
 from utils.job_load import get_edgelist_job_dir_path, get_job_num, load_edgelist
+from constants import LARGE_GRAPH_MIN_NODES, LARGE_GRAPH_TOP_K_LABELS, LAYOUT_CACHE_FNAME, OPS_PER_SECOND
+from utils.fetch import lookup_users
+from utils.graph_stats import (
+    approximate_diameter,
+    estimate_diameter_cost,
+    estimate_transitivity_cost,
+    sample_transitivity,
+)
+from utils.layout import large_graph_layout, load_cached_layout, save_cached_layout
+from utils.metrics import metrics
+from utils.sparse_graph import SparseGraph
 from utils.twitter_auth import get_twitter_api
 
 
+@metrics.timed("graph_build")
 def initialize_graph(edgelist):
     """
     Initialize NetworkX graph object.
@@ -19,33 +33,47 @@ def initialize_graph(edgelist):
     return G
 
 
-def get_in_degree_centrality_with_nodelist(G, job_dir, fields=[], nodelist_name="", n=-1):
+def load_nodelist(job_dir, nodelist_name=""):
     """
-    Compute in-degree centrality and return a Series of top n nodes. Use n=-1 for all nodes.
+    Load a nodelist once per run as a DataFrame indexed by user ID (int64), with one column per user field.
     """
-    d = dict(G.in_degree())
-    data = {"id_str": [], "in_degree": []}
-    for node, in_degree in d.items():
-        data["id_str"].append(node)
-        data["in_degree"].append(in_degree)
-    if n == -1:
-        df = pd.DataFrame(data).sort_values(by="in_degree", ascending=False)
-    else:
-        df = pd.DataFrame(data).sort_values(by="in_degree", ascending=False).head(n)
-    nodelist_dict = (
-        pd.read_csv(
-            f"{job_dir}nodelists/nodelist{nodelist_name}.csv",
-            index_col=0,
-            dtype={"id_str": str},
-        )
-        .set_index("id_str")
-        .to_dict(orient="index")
+    nodelist = pd.read_csv(
+        f"{job_dir}nodelists/nodelist{nodelist_name}.csv",
+        index_col=0,
+        dtype={"id_str": "int64"},
+    ).set_index("id_str")
+    # Users looked up more than once (e.g. in overlapping batches) are kept once
+    return nodelist[~nodelist.index.duplicated()]
+
+
+def get_in_degrees(G):
+    """
+    Get a Series of in-degrees indexed by node, for a NetworkX graph or a SparseGraph.
+    """
+    in_degree = G.in_degree()
+    if isinstance(in_degree, pd.Series):
+        return in_degree
+    nodes, degrees = zip(*in_degree) if G.number_of_nodes() else ((), ())
+    return pd.Series(degrees, index=pd.Index(nodes, dtype="int64"), dtype="int64")
+
+
+def get_in_degree_centrality_with_nodelist(G, nodelist, fields=[], n=-1):
+    """
+    Compute in-degree centrality and return a DataFrame of top n nodes with their fields from the nodelist. Use n=-1 for all nodes.
+    Fields are attached with a left join on the user ID, so nodes missing from the nodelist get empty fields.
+    """
+    df = (
+        get_in_degrees(G)
+        .rename_axis("id_str")
+        .reset_index(name="in_degree")
+        .sort_values(by="in_degree", ascending=False)
     )
+    if n != -1:
+        df = df.head(n)
     if not fields:
         fields = ["screen_name", "followers_count", "friends_count"]
-    for field in fields:
-        df[field] = df["id_str"].apply(lambda x: nodelist_dict[x][field])
-    return df
+    # Nullable dtypes keep counts as integers where nodes are missing
+    return df.join(nodelist[fields], on="id_str").convert_dtypes()
 
 
 def get_id_list(edgelist):
@@ -57,10 +85,11 @@ def get_id_list(edgelist):
     return s1.union(s2)
 
 
+@metrics.timed("nodelist")
 def make_nodelist(api, job_dir, ids, fields=[]):
     """
     Load nodelist--Twitter data about specified IDs. 
-    API reference(s): https://docs.tweepy.org/en/stable/api.html#tweepy.API.get_user and https://developer.twitter.com/en/docs/twitter-api/v1/data-dictionary/object-model/user
+    API reference(s): https://docs.tweepy.org/en/stable/api.html#tweepy.API.lookup_users and https://developer.twitter.com/en/docs/twitter-api/v1/data-dictionary/object-model/user
     """
     # Load default value of fields
     if not fields or len(fields) == 0:
@@ -72,41 +101,40 @@ def make_nodelist(api, job_dir, ids, fields=[]):
             "friends_count",
             "verified",
         ]
-    nodelist = []
-    nodelist_failed = set()
-    for id in ids:
-        try:
-            user = api.get_user(user_id=id)._json
-            # Construct nodelist, list of dicts. Dict key names correspond to field names from user object. Grab fields specified in var fields
-            nodelist.append({field: user[field] for field in fields})
-            sleep(0.1)
-        except Exception as e:
-            print(repr(e))
-            nodelist_failed.add(id)
-    print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted nodelist")
-    # Save nodelist to CSV
-    os.mkdir(f"{job_dir}nodelists/")
-    sleep(1)
-    pd.DataFrame(nodelist).to_csv(f"{job_dir}nodelists/nodelist.csv")
+    nodelists_dir = f"{job_dir}nodelists/"
+    if not os.path.exists(nodelists_dir):
+        os.mkdir(nodelists_dir)
+    n_nodes = 0
+    n_failed = 0
+    # Stream each batch of users to CSV as it arrives. The first, unnamed column is the row index
+    with open(f"{nodelists_dir}nodelist.csv", "w") as f, open(
+        f"{nodelists_dir}nodelist_failed.csv", "w"
+    ) as f_failed:
+        writer = csv.writer(f)
+        writer.writerow([""] + fields)
+        for users, failed in lookup_users(api, user_ids=list(ids)):
+            # Grab fields specified in var fields from each user object
+            for user in users:
+                writer.writerow([n_nodes] + [user[field] for field in fields])
+                n_nodes += 1
+            for id in failed:
+                f_failed.write(f"{id}\n")
+            n_failed += len(failed)
+    print(
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted nodelist of {n_nodes} users, failed to extract {n_failed} users"
+    )
     print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tSaved nodelist to CSV")
     return 0
 
 
-def set_attributes_from_nodelist(G, job_dir, nodelist_name=""):
+def set_attributes_from_nodelist(G, nodelist):
     """
-    Set node attributes for nodes in G.
+    Set node attributes for nodes in G from the nodelist. Nodes missing from the nodelist get no attributes.
     """
-    # Load nodelist from file
-    nodelist = pd.read_csv(
-        f"{job_dir}nodelists/nodelist{nodelist_name}.csv",
-        index_col=0,
-        dtype={"id_str": str},
-    )
-    # Modify nodelist DataFrame into attrs dict
-    attrs = nodelist.set_index("id_str").to_dict("index")
+    attrs = nodelist[nodelist.index.isin(list(G))].to_dict("index")
     nx.set_node_attributes(G, attrs)
     print(
-        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tSet node attributes for graph for nodelist in job {job_num}"
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tSet node attributes for {len(attrs)} of {G.number_of_nodes()} nodes"
     )
     return G
 
@@ -115,10 +143,14 @@ def visualize_graph(G, job_dir):
     """
     Visualize graph and save it to file.
     """
+    # matplotlib is only imported to draw, as it's slow to import
+    import matplotlib.pyplot as plt
+
     # Draw figure
     node_sizes = [i * 20 for i in dict(G.in_degree).values()]
     f = plt.figure(figsize=(10, 10))
-    pos = nx.spring_layout(G, k=5)
+    with metrics.timer("layout"):
+        pos = nx.spring_layout(G, k=5)
     nx.draw(
         G,
         pos=pos,
@@ -131,8 +163,58 @@ def visualize_graph(G, job_dir):
     if not os.path.exists(f"{job_dir}viz/"):
         os.mkdir(f"{job_dir}viz/")
     plt.savefig(fname, dpi=300)
+    plt.close(f)
+    print(
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tGraph visualized and file saved to {fname}"
+    )
+    return 0
+
+
+def visualize_large_graph(G, job_dir, labels={}, top_k=LARGE_GRAPH_TOP_K_LABELS):
+    """
+    Visualize a large graph (a SparseGraph) and save it to a rasterized PNG file. Only the top_k nodes by in-degree are labeled,
+    with their labels from `labels` (a dict or Series of node ID to screen name). Positions are cached in the job's viz dir and reused
+    as long as the nodes and edges don't change.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    if not os.path.exists(f"{job_dir}viz/"):
+        os.mkdir(f"{job_dir}viz/")
+    layout_fname = f"{job_dir}viz/{LAYOUT_CACHE_FNAME}"
+    pos = load_cached_layout(layout_fname, G.nodes, G.adjacency)
+    if pos is None:
+        with metrics.timer("layout"):
+            pos = large_graph_layout(G.adjacency)
+        save_cached_layout(layout_fname, G.nodes, G.adjacency, pos)
+        print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tComputed and cached graph layout")
+    else:
+        print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded cached graph layout")
+
+    # Draw figure
+    in_degree = G.in_degree().to_numpy()
+    f = plt.figure(figsize=(10, 10))
+    ax = f.add_subplot()
+    ax.set_axis_off()
+    adjacency = G.adjacency.tocoo()
+    edges = LineCollection(
+        np.stack([pos[adjacency.row], pos[adjacency.col]], axis=1),
+        linewidths=0.1,
+        colors="grey",
+        alpha=0.2,
+        rasterized=True,
+    )
+    ax.add_collection(edges)
+    ax.scatter(pos[:, 0], pos[:, 1], s=1 + in_degree * 20 / max(in_degree.max(), 1), rasterized=True)
+    for i in np.argsort(-in_degree)[:top_k]:
+        ax.annotate(str(labels.get(G.nodes[i], G.nodes[i])), pos[i], fontsize=6)
+    ax.autoscale()
+    # Save figure
+    fname = f"{job_dir}viz/{strftime('%Y_%m_%d__%H_%M_%S', gmtime())}.png"
+    plt.savefig(fname, dpi=300)
+    plt.close(f)
     print(
-        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tGraph visualized and file saved for job {job_num}"
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLarge graph visualized and file saved to {fname}"
     )
     return 0
 
@@ -145,45 +227,74 @@ def generate_new_nodelist(edgelist, job_dir):
     api = get_twitter_api()
     make_nodelist(api, job_dir, ids, fields=[])
     print(
-        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tGenerated new nodelist for job {job_num}"
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tGenerated new nodelist for job dir {job_dir}"
     )
     return 0
 
 
-def analyze_network_structure(G):
+@metrics.timed("network_structure")
+def analyze_network_structure(G, time_budget=None):
     """
-    Analyze the structure of network G.
+    Analyze the structure of network G. With a time budget (in seconds), each metric whose exact computation
+    is estimated to take longer is approximated: transitivity by wedge sampling (with a 95% confidence interval),
+    and the diameter by double-sweep lower and upper bounds. Without one, all metrics are exact.
+    G can be a NetworkX DiGraph or a SparseGraph.
     """
+    is_sparse = isinstance(G, SparseGraph)
+    stats = {}
     n_nodes = G.number_of_nodes()
     n_edges = G.number_of_edges()
     n_edges_max = n_edges * (n_edges - 1)
-    density = nx.density(G)
+    density = G.density() if is_sparse else nx.density(G)
     print(f"Number of nodes: {n_nodes}")
     print(f"Number of edges: {n_edges}")
     print(f"Maximum possible number of edges: {n_edges_max}")
     print(f"Density: {density}")
+    stats.update(n_nodes=n_nodes, n_edges=n_edges, density=density)
 
-    transitivity = nx.transitivity(G)
-    print(f"Transitivity: {transitivity}")
+    if time_budget is None or estimate_transitivity_cost(G) / OPS_PER_SECOND <= time_budget:
+        transitivity = G.transitivity() if is_sparse else nx.transitivity(G)
+        print(f"Transitivity: {transitivity}")
+    else:
+        transitivity, margin = G.sample_transitivity() if is_sparse else sample_transitivity(G)
+        print(f"Transitivity (sampled): {round(transitivity, 4)} ± {round(margin, 4)}")
+        stats["transitivity_margin"] = margin
+    stats["transitivity"] = transitivity
 
-    is_sc = nx.is_strongly_connected(G)
+    # Compute strongly connected components once
+    if is_sparse:
+        lscc_subgraph = G.largest_strongly_connected_component()
+    else:
+        lscc_subgraph = G.subgraph(max(nx.strongly_connected_components(G), key=len))
+    is_sc = lscc_subgraph.number_of_nodes() == n_nodes
     print(f"Strongly connected: {is_sc}")
-    if nx.is_strongly_connected(G) == False:
-        # Get largest SC component
-        sc_components = nx.strongly_connected_components(G)
-        largest_sc_component = max(sc_components, key=len)
-        lscc_subgraph = G.subgraph(largest_sc_component)
-        n_outside_nodes = n_nodes - len(lscc_subgraph.nodes())
+    stats["strongly_connected"] = is_sc
+    if not is_sc:
+        n_outside_nodes = n_nodes - lscc_subgraph.number_of_nodes()
         print(
             f"Number of nodes outside the largest strongly connected component: {n_outside_nodes}"
         )
+        stats["n_outside_nodes"] = n_outside_nodes
+    component = "largest" if not is_sc else "only"
 
-        diameter = nx.diameter(lscc_subgraph)
-        print(f"Diameter (of the largest strongly connected component): {diameter}")
+    if time_budget is None or (
+        estimate_diameter_cost(lscc_subgraph.number_of_nodes(), lscc_subgraph.number_of_edges())
+        / OPS_PER_SECOND
+        <= time_budget
+    ):
+        diameter = lscc_subgraph.diameter() if is_sparse else nx.diameter(lscc_subgraph)
+        print(f"Diameter (of the {component} strongly connected component): {diameter}")
+        stats["diameter"] = diameter
     else:
-        diameter = nx.diameter(G)
-        print(f"Diameter (of the only strongly connected component): {diameter}")
-    return 0
+        if is_sparse:
+            lower, upper = lscc_subgraph.approximate_diameter()
+        else:
+            lower, upper = approximate_diameter(lscc_subgraph)
+        print(
+            f"Diameter (of the {component} strongly connected component): between {lower} and {upper}"
+        )
+        stats.update(diameter_lower=lower, diameter_upper=upper)
+    return stats
 
 
 def get_largest_component(G):
@@ -193,35 +304,60 @@ def get_largest_component(G):
     return G.subgraph(max(nx.strongly_connected_components(G), key=len))
 
 
-# Load edgelist
-job_num = get_job_num()
-job_dir = get_edgelist_job_dir_path(job_num)
-edgelist = load_edgelist(job_dir)
+def main(job_num=None, filters=None, nodelist_mode="", time_budget=None, backend="networkx"):
+    """
+    Analyze the network of a job and visualize it. Values not given are asked for: the job number, the groups of nodes
+    to filter out ('outsiders' and/or 'original'), and whether to make a new nodelist ('new') or use the existing one ('existing').
+    """
+    # Load edgelist
+    if job_num is None:
+        job_num = get_job_num()
+    job_dir = get_edgelist_job_dir_path(job_num)
+    edgelist = load_edgelist(job_dir)
 
-filters = input(
-    "Select group(s) of nodes to filter out\n\ta : outsiders\n\tb : original set\nType 'a' and/or 'b' or click Enter:\n"
-)
-if filters:
-    if "a" in filters:
+    if filters is None:
+        entered = input(
+            "Select group(s) of nodes to filter out\n\ta : outsiders\n\tb : original set\nType 'a' and/or 'b' or click Enter:\n"
+        )
+        filters = [name for letter, name in (("a", "outsiders"), ("b", "original")) if letter in entered]
+    if "outsiders" in filters:
         edgelist = filter_out_outsiders(edgelist)
-    if "b" in filters:
+    if "original" in filters:
         edgelist = filter_out_original(edgelist, job_dir_og=job_dir)
 
-# Load edgelist
-job_dir = get_edgelist_job_dir_path(job_num)
-# If nodelist doesn't exist
-if not os.path.exists(f"{job_dir}nodelists/nodelist.csv"):
-    # Generate new nodelist
-    generate_new_nodelist(edgelist, job_dir)
-else:
-    is_new_nodelist = input(
-        "Generate new nodelist? For 'n', existing nodelist will be used. Type 'y' or 'n':\n"
-    )
-    if is_new_nodelist == "y":
+    # If nodelist doesn't exist
+    if not os.path.exists(f"{job_dir}nodelists/nodelist.csv"):
+        # Generate new nodelist
         generate_new_nodelist(edgelist, job_dir)
+    else:
+        if not nodelist_mode:
+            is_new_nodelist = input(
+                "Generate new nodelist? For 'n', existing nodelist will be used. Type 'y' or 'n':\n"
+            )
+            nodelist_mode = "new" if is_new_nodelist == "y" else "existing"
+        if nodelist_mode == "new":
+            generate_new_nodelist(edgelist, job_dir)
+
+    # Parse the nodelist once, for node attributes, the in-degree ranking and labels
+    nodelist = load_nodelist(job_dir)
+    if backend == "sparse":
+        G = SparseGraph.from_edgelist(edgelist)
+        print(f"Nodes: {G.number_of_nodes()}\nEdges: {G.number_of_edges()}")
+    else:
+        G = initialize_graph(edgelist)
+        G = set_attributes_from_nodelist(G, nodelist)
+    analyze_network_structure(G, time_budget=time_budget)
+    get_in_degree_centrality_with_nodelist(G, nodelist).to_csv(f"files/in_deg_{job_num}.csv")
+    if backend == "sparse" or G.number_of_nodes() > LARGE_GRAPH_MIN_NODES:
+        if backend != "sparse":
+            G = SparseGraph.from_edgelist(edgelist)
+        visualize_large_graph(G, job_dir, labels=nodelist["screen_name"])
+    else:
+        visualize_graph(G, job_dir)
+    return metrics.export("analyze", job_dirs=[job_dir])
+
+
+if __name__ == "__main__":
+    from twitnet import main as twitnet
 
-G = initialize_graph(edgelist)
-G = set_attributes_from_nodelist(G, job_dir)
-analyze_network_structure(G)
-get_in_degree_centrality_with_nodelist(G, job_dir).to_csv(f"files/in_deg_{job_num}.csv")
-visualize_graph(G, job_dir)
+    twitnet(["analyze", *sys.argv[1:]])
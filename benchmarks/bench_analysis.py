@@ -0,0 +1,229 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+import numpy as np
+import pandas as pd
+from analyze import (
+    analyze_network_structure,
+    get_in_degree_centrality_with_nodelist,
+    initialize_graph,
+    load_nodelist,
+    visualize_graph,
+    visualize_large_graph,
+)
+from constants import (
+    CONCAT_FNAME,
+    EDGE_INDEX_FNAME,
+    EDGE_INDEX_MANIFEST_FNAME,
+    EDGELIST_FNAME,
+    EDGELIST_JOBS_FOLDER_NAME,
+    LARGE_GRAPH_MIN_NODES,
+    NEXT_EDGELIST_JOB_FNAME,
+)
+from discover import explore_graph
+from utils.filter_edgelist import filter_out_outsiders
+from utils.job_load import load_edgelist
+from utils.sparse_graph import SparseGraph
+
+BASELINE_FNAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "bench_analysis.json")
+# A stage regresses if it takes this much longer (fraction of its baseline, plus slack for timer noise)
+TIME_TOLERANCE = 0.5
+TIME_SLACK = 0.05
+MEMORY_TOLERANCE = 0.2
+MEMORY_SLACK = 1.0
+# Each crawled user's friends are drawn from a population this many times larger than the crawl
+POPULATION_FACTOR = 10
+FIRST_USER_ID = 1000000
+
+
+def sample_weighted(rng, cum_weights, starts, ends):
+    """
+    Draw one index per (start, end) pair, in [start, end), with probability proportional to the weights whose
+    cumulative sums are `cum_weights`.
+    """
+    low = np.where(starts > 0, cum_weights[np.maximum(starts - 1, 0)], 0.0)
+    r = low + rng.random(len(starts)) * (cum_weights[ends - 1] - low)
+    return np.minimum(np.searchsorted(cum_weights, r, side="right"), ends - 1)
+
+
+def make_follow_graph(
+    n_users, mean_friends=100, n_communities=20, p_in_community=0.7, reciprocity=0.22, exponent=2.1, seed=0
+):
+    """
+    Generate a follow graph as an int64 DataFrame with columns `source` and `target`. Out-degrees and popularity
+    (how likely an account is to be followed) are power-law distributed with the given exponent, a `p_in_community`
+    fraction of follows stay within the follower's community, and a `reciprocity` fraction of follows are followed back.
+    """
+    rng = np.random.default_rng(seed)
+    community = np.sort(rng.integers(0, n_communities, n_users))
+    bounds = np.searchsorted(community, np.arange(n_communities + 1))
+    popularity = rng.pareto(exponent - 1, n_users) + 1
+    cum_popularity = np.cumsum(popularity)
+    n_friends = np.minimum((rng.pareto(exponent - 1, n_users) + 1) * mean_friends * (exponent - 2) / (exponent - 1), n_users - 1)
+    sources = np.repeat(np.arange(n_users), rng.poisson(n_friends))
+    in_community = rng.random(len(sources)) < p_in_community
+    starts = np.where(in_community, bounds[community[sources]], 0)
+    ends = np.where(in_community, bounds[community[sources] + 1], n_users)
+    targets = sample_weighted(rng, cum_popularity, starts, ends)
+    followed_back = rng.random(len(sources)) < reciprocity
+    edges = np.concatenate(
+        [np.stack([sources, targets], axis=1), np.stack([targets[followed_back], sources[followed_back]], axis=1)]
+    )
+    edges = np.unique(edges[edges[:, 0] != edges[:, 1]], axis=0)
+    # Shuffle user IDs, so that communities aren't contiguous ID ranges
+    ids = FIRST_USER_ID + rng.permutation(n_users).astype(np.int64)
+    return pd.DataFrame({"source": ids[edges[:, 0]], "target": ids[edges[:, 1]]})
+
+
+def make_jobs(app_dir, n_crawled, seed=0):
+    """
+    Lay out a crawl of `n_crawled` users like the app does: their edges are split between job 0 and job 1, whose
+    concat file lists job 0's edgelist, and job 1 has a nodelist of every user in both jobs. Return job 1's dir.
+    """
+    follows = make_follow_graph(n_crawled * POPULATION_FACTOR, seed=seed)
+    rng = np.random.default_rng(seed)
+    crawled = rng.choice(follows["source"].unique(), size=n_crawled, replace=False)
+    edgelist = follows[follows["source"].isin(crawled)]
+    jobs_path = f"{app_dir}{EDGELIST_JOBS_FOLDER_NAME}"
+    job_dirs = [f"{jobs_path}{job_num}/" for job_num in range(2)]
+    for job_dir in job_dirs:
+        os.makedirs(f"{job_dir}nodelists/")
+    with open(f"{jobs_path}{NEXT_EDGELIST_JOB_FNAME}", "w") as f:
+        f.write(str(len(job_dirs)))
+    first_half = edgelist["source"].isin(crawled[: n_crawled // 2])
+    edgelist[first_half].to_csv(f"{job_dirs[0]}{EDGELIST_FNAME}", header=False, index=False)
+    edgelist[~first_half].to_csv(f"{job_dirs[1]}{EDGELIST_FNAME}", header=False, index=False)
+    with open(f"{job_dirs[1]}{CONCAT_FNAME}", "w") as f:
+        f.write(f"{job_dirs[0]}{EDGELIST_FNAME}\n")
+
+    ids = pd.unique(np.concatenate([edgelist["source"].to_numpy(), edgelist["target"].to_numpy()]))
+    pd.DataFrame(
+        {
+            "id_str": ids,
+            "name": [f"User {i}" for i in ids],
+            "screen_name": [f"user{i}" for i in ids],
+            "followers_count": follows["target"].value_counts().reindex(ids, fill_value=0).to_numpy(),
+            "friends_count": follows["source"].value_counts().reindex(ids, fill_value=0).to_numpy(),
+            "verified": rng.random(len(ids)) < 0.01,
+        }
+    ).to_csv(f"{job_dirs[1]}nodelists/nodelist.csv")
+    return job_dirs[1], len(edgelist)
+
+
+def load_stage(job_dir):
+    # Start from an empty edge index, as for the first load of a job
+    for fname in (EDGE_INDEX_FNAME, EDGE_INDEX_MANIFEST_FNAME):
+        if os.path.exists(f"{job_dir}{fname}"):
+            os.remove(f"{job_dir}{fname}")
+    return load_edgelist(job_dir)
+
+
+def discover_stage(job_dir, edgelist, filtered):
+    Gf = initialize_graph(filtered)
+    return explore_graph(Gf, edgelist, 0.5, job_dir, 1, min_community_size=3, method="auto")
+
+
+def visualize_stage(job_dir, G, filtered, nodelist):
+    # Start without a cached layout
+    shutil.rmtree(f"{job_dir}viz/", ignore_errors=True)
+    if G.number_of_nodes() > LARGE_GRAPH_MIN_NODES:
+        return visualize_large_graph(SparseGraph.from_edgelist(filtered), job_dir, labels=nodelist["screen_name"])
+    return visualize_graph(G, job_dir)
+
+
+def measure(func, *args):
+    """
+    Run a stage twice with its output suppressed: once for its time, then under tracemalloc for its peak memory
+    (tracing slows allocation-heavy code down, so it isn't timed). Return (result, seconds, peak MB).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = perf_counter()
+        res = func(*args)
+        elapsed = perf_counter() - start
+        del res
+        tracemalloc.start()
+        res = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return res, elapsed, peak / 2**20
+
+
+def run_size(n_crawled, time_budget=10):
+    """
+    Generate jobs for a crawl of `n_crawled` users and measure each analysis stage on them, analyzing the graph
+    of crawled users (outsiders filtered out) like analyze.py does. Return a dict of stage name to (seconds, peak MB).
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as app_dir:
+        job_dir, n_edges = make_jobs(app_dir, n_crawled)
+        print(f"{n_crawled} crawled users, {n_edges} edges")
+        edgelist, *results["load_edgelist"] = measure(load_stage, job_dir)
+        filtered, *results["filter_out_outsiders"] = measure(filter_out_outsiders, edgelist)
+        _, *results["explore_graph"] = measure(discover_stage, job_dir, edgelist, filtered)
+        nodelist = load_nodelist(job_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            G = initialize_graph(filtered)
+        _, *results["analyze_network_structure"] = measure(analyze_network_structure, G, time_budget)
+        _, *results["in_degree_centrality"] = measure(get_in_degree_centrality_with_nodelist, G, nodelist)
+        _, *results["visualize"] = measure(visualize_stage, job_dir, G, filtered, nodelist)
+    for stage, (elapsed, peak) in results.items():
+        print(f"{stage}\t{elapsed:.3f} s\t{peak:.1f} MB")
+    return results
+
+
+def find_regressions(results, baseline):
+    """
+    Compare results with a baseline of the same shape ({size: {stage: [seconds, peak MB]}}) and list the regressions.
+    Sizes and stages missing from the baseline are skipped.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, (elapsed, peak) in stages.items():
+            if stage not in baseline.get(size, {}):
+                continue
+            base_elapsed, base_peak = baseline[size][stage]
+            if elapsed > base_elapsed * (1 + TIME_TOLERANCE) + TIME_SLACK:
+                regressions.append(f"{stage} ({size} users): {elapsed:.3f} s vs {base_elapsed:.3f} s baseline")
+            if peak > base_peak * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK:
+                regressions.append(f"{stage} ({size} users): {peak:.1f} MB vs {base_peak:.1f} MB baseline")
+    return regressions
+
+
+if __name__ == "__main__":
+    # Usage (from the app folder): python3 -m benchmarks.bench_analysis [n_crawled ...] [--save-baseline]
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "sizes", nargs="*", type=int, help="numbers of crawled users to generate jobs for (default: 1000 5000 20000)"
+    )
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FNAME, help=f"baseline file (default: {BASELINE_FNAME})")
+    args = parser.parse_args()
+
+    results = {str(n_crawled): run_size(n_crawled) for n_crawled in args.sizes or [1000, 5000, 20000]}
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        baseline.update({size: {stage: [round(v, 3) for v in r] for stage, r in stages.items()} for size, stages in results.items()})
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}. Run with --save-baseline to store one")
+    else:
+        with open(args.baseline, "r") as f:
+            regressions = find_regressions(results, json.load(f))
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
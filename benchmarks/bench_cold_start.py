@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+# Modules imported by each command of twitnet.py before its work starts: the command's script, and tweepy for the
+# commands that build an API client right away (utils.twitter_auth imports it on first use)
+COMMAND_MODULES = {
+    "init": ["initialize", "tweepy"],
+    "search": ["search", "tweepy"],
+    "load": ["load", "tweepy"],
+    "crawl --chunk": ["process_chunk", "tweepy"],
+    "crawl": ["crawl", "tweepy"],
+    "discover": ["discover"],
+    "analyze": ["analyze", "tweepy"],
+}
+# Most start-up time the cron-driven chunk runs may add to the interpreter's own, in seconds. tweepy and requests take
+# about 0.2 s of it; NumPy, pandas or NetworkX would each go over
+CHUNK_COLD_START_BUDGET = 0.3
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_python(code, repeat=5):
+    """
+    Get the shortest wall-clock time of running `code` in a new interpreter from the app folder, in seconds
+    (the least disturbed by other load on the machine).
+    """
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, check=True)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def run_benchmark(repeat=5):
+    """
+    Print the cold start of each command (importing twitnet.py and the command's modules) over that of the bare
+    interpreter. Return 1 if crawl --chunk, which the crontab runs every few minutes, is over its budget.
+    """
+    interpreter = time_python("pass", repeat)
+    print(f"interpreter\t{interpreter:.3f} s")
+    print(f"twitnet --help\t+{time_python('import twitnet', repeat) - interpreter:.3f} s")
+    overheads = {}
+    for command, modules in COMMAND_MODULES.items():
+        overheads[command] = time_python(f"import twitnet, {', '.join(modules)}", repeat) - interpreter
+        print(f"{command}\t+{overheads[command]:.3f} s")
+    if overheads["crawl --chunk"] > CHUNK_COLD_START_BUDGET:
+        print(f"crawl --chunk starts over its budget of {CHUNK_COLD_START_BUDGET} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage (from the app folder): python3 -m benchmarks.bench_cold_start [repeat]
+    sys.exit(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
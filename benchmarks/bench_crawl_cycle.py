@@ -0,0 +1,165 @@
+import contextlib
+import io
+import math
+import os
+import sys
+import tempfile
+from time import perf_counter
+import numpy as np
+from analyze import (
+    analyze_network_structure,
+    get_id_list,
+    get_in_degree_centrality_with_nodelist,
+    initialize_graph,
+    load_nodelist,
+    make_nodelist,
+    set_attributes_from_nodelist,
+)
+from crawl import crawl_jobs
+from discover import explore_graph
+from initialize import initialize_app
+from load import expand_frontier, make_edgelist_job_dir
+from search import get_users_from_query
+from utils.edge_store import count_edges
+from utils.fake_api import FakeTwitterAPI, VirtualClock, make_synthetic_graph
+from utils.filter_edgelist import filter_out_outsiders
+from utils.id_store import IdStore
+from utils.job_load import get_edgelist_job_dir_path, load_edgelist
+from utils.rate_limit import rate_limiter
+from utils.twitter_auth import get_twitter_api, set_twitter_api
+
+
+def run_stage(stages, name, clock, func, *args, **kwargs):
+    """
+    Run one stage of the cycle with its output suppressed, recording its wall-clock time, virtual time
+    (which includes rate-limit waits and simulated latency) and requests sent per endpoint.
+    """
+    sent_before = dict(rate_limiter.sent)
+    virtual_start = clock.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = perf_counter()
+        res = func(*args, **kwargs)
+        elapsed = perf_counter() - start
+    stages.append(
+        {
+            "name": name,
+            "wall": elapsed,
+            "virtual": clock.time() - virtual_start,
+            "requests": {
+                endpoint: n - sent_before.get(endpoint, 0)
+                for endpoint, n in rate_limiter.sent.items()
+                if n > sent_before.get(endpoint, 0)
+            },
+        }
+    )
+    return res
+
+
+def get_rate_limit_floor(requests, limits, window):
+    """
+    Get the shortest time in which the given numbers of requests per endpoint can be sent: requests beyond
+    each window's quota have to wait for the next window, and endpoints are limited independently.
+    """
+    return max(
+        [(math.ceil(n / limits[endpoint]) - 1) * window for endpoint, n in requests.items() if n > 0] or [0]
+    )
+
+
+def search_stage(api, n_seeds):
+    return get_users_from_query(api, "synthetic", min_follower_count=0, target_users=n_seeds, max_requests=None)
+
+
+def load_stage(api, seeds, level_cap):
+    job_num = make_edgelist_job_dir()
+    job_dir = get_edgelist_job_dir_path(job_num)
+    id_store = IdStore(job_dir)
+    id_store.add(seeds)
+    expand_frontier(api, id_store, 1, level_cap=level_cap)
+    return job_num, job_dir, len(id_store)
+
+
+def discover_stage(job_dir, job_num):
+    edgelist = load_edgelist(job_dir)
+    Gf = initialize_graph(filter_out_outsiders(edgelist))
+    return explore_graph(Gf, edgelist, 0.5, job_dir, job_num, min_community_size=3, method="louvain")
+
+
+def analyze_stage(api, job_dir):
+    edgelist = load_edgelist(job_dir)
+    make_nodelist(api, job_dir, get_id_list(edgelist))
+    nodelist = load_nodelist(job_dir)
+    G = set_attributes_from_nodelist(initialize_graph(edgelist), nodelist)
+    stats = analyze_network_structure(G, time_budget=10)
+    get_in_degree_centrality_with_nodelist(G, nodelist, n=100)
+    return stats
+
+
+def run_benchmark(n_users=20000, latency=0.2, n_seeds=100, level_cap=200):
+    """
+    Run a full search -> load -> crawl -> discover -> analyze cycle against a fake Twitter API serving a synthetic
+    graph of `n_users` users, in a temporary app folder. Rate-limit waits and request latency pass on a virtual
+    clock, so the cycle takes seconds of wall-clock time. Print the time and requests of each stage, requests
+    per collected edge, and the virtual time of the cycle against its rate-limit floor.
+    """
+    start = perf_counter()
+    friends = make_synthetic_graph(n_users=n_users)
+    rng = np.random.default_rng(1)
+    user_ids = np.fromiter(friends.keys(), dtype=np.int64, count=len(friends))
+    # 2% of accounts are protected, 1% suspended
+    protected, suspended = np.split(rng.choice(user_ids, size=3 * len(user_ids) // 100, replace=False), [len(user_ids) // 50])
+    clock = VirtualClock()
+    fake = FakeTwitterAPI(friends, clock=clock, latency=latency, protected=protected, suspended=suspended)
+    print(f"Generated synthetic graph of {n_users} users in {perf_counter() - start:.1f} s")
+
+    cwd = os.getcwd()
+    clock_before = rate_limiter.clock
+    stages = []
+    with tempfile.TemporaryDirectory() as app_dir:
+        os.chdir(app_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                initialize_app()
+            set_twitter_api(fake)
+            rate_limiter.clock = clock
+            api = get_twitter_api()
+            seeds = run_stage(stages, "search", clock, search_stage, api, n_seeds)
+            job_num, job_dir, n_ids = run_stage(stages, "load", clock, load_stage, api, seeds, level_cap)
+            run_stage(stages, "crawl", clock, crawl_jobs, api, [job_dir])
+            n_edges = count_edges(job_dir)
+            run_stage(stages, "discover", clock, discover_stage, job_dir, job_num)
+            run_stage(stages, "analyze", clock, analyze_stage, api, job_dir)
+        finally:
+            set_twitter_api(None)
+            rate_limiter.clock = clock_before
+            os.chdir(cwd)
+
+    print(f"Seeds: {len(seeds)}\tIDs crawled: {n_ids}\tEdges collected: {n_edges}")
+    print("stage\twall\tvirtual\trequests")
+    for stage in stages:
+        requests = ", ".join(f"{endpoint}: {n}" for endpoint, n in stage["requests"].items()) or "-"
+        print(f"{stage['name']}\t{stage['wall']:.2f} s\t{stage['virtual']:.0f} s\t{requests}")
+
+    requests = {}
+    for stage in stages:
+        for endpoint, n in stage["requests"].items():
+            requests[endpoint] = requests.get(endpoint, 0) + n
+    n_requests = sum(requests.values())
+    n_rejected = sum(fake.n_requests.values()) - n_requests
+    print(f"Requests: {n_requests} ({n_rejected} rejected with 429)")
+    print(
+        f"Requests per edge: {n_requests / max(n_edges, 1):.5f} (friends/ids: {requests.get('friends/ids', 0) / max(n_edges, 1):.5f})"
+    )
+    virtual = sum(stage["virtual"] for stage in stages)
+    floor = get_rate_limit_floor(requests, fake.limits, fake.window)
+    print(
+        f"Virtual time: {virtual:.0f} s\tRate-limit floor: {floor:.0f} s\tOverhead: {virtual - floor:.0f} s"
+    )
+    print(f"Wall-clock time: {sum(stage['wall'] for stage in stages):.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage (from the app folder): python3 -m benchmarks.bench_crawl_cycle [n_users] [latency in seconds]
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    run_benchmark(n_users=n_users, latency=latency)
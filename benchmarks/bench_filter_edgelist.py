@@ -0,0 +1,62 @@
+import contextlib
+import io
+import sys
+import tempfile
+from time import perf_counter
+import numpy as np
+import pandas as pd
+from utils.filter_edgelist import filter_out_original, filter_out_outsiders
+
+
+def make_edgelist(n_edges, n_sources, n_targets, seed=0):
+    """
+    Generate a random int64 edgelist, where sources are a subset of targets (like a crawled job).
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "source": rng.integers(0, n_sources, n_edges, dtype=np.int64),
+            "target": rng.integers(0, n_targets, n_edges, dtype=np.int64),
+        }
+    )
+
+
+def time_filter(func, *args):
+    """
+    Run a filter with its output suppressed, and return (seconds, number of edges kept).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = perf_counter()
+        filtered = func(*args)
+        elapsed = perf_counter() - start
+    return elapsed, len(filtered)
+
+
+def run_benchmark(sizes):
+    """
+    Print the throughput of both edgelist filters for each edgelist size.
+    """
+    for n_edges in sizes:
+        # Each crawled user follows ~1000 accounts, 5% of which are other crawled users
+        n_sources = max(n_edges // 1000, 1)
+        edgelist = make_edgelist(n_edges, n_sources, n_sources * 20)
+        elapsed, n_kept = time_filter(filter_out_outsiders, edgelist)
+        print(
+            f"filter_out_outsiders\t{n_edges} edges\t{elapsed:.3f} s\t{n_edges / elapsed / 1e6:.1f}M edges/s\t{n_kept} kept"
+        )
+        with tempfile.TemporaryDirectory() as job_dir:
+            # Half of the sources are the original set
+            with open(f"{job_dir}/twitter_ids_og.csv", "w") as f:
+                f.writelines(f"{i}\n" for i in range(0, n_sources, 2))
+            elapsed, n_kept = time_filter(filter_out_original, edgelist, f"{job_dir}/")
+        print(
+            f"filter_out_original\t{n_edges} edges\t{elapsed:.3f} s\t{n_edges / elapsed / 1e6:.1f}M edges/s\t{n_kept} kept"
+        )
+        del edgelist
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage (from the app folder): python3 -m benchmarks.bench_filter_edgelist [n_edges ...]
+    sizes = [int(i) for i in sys.argv[1:]] or [1000000, 10000000, 50000000]
+    run_benchmark(sizes)
@@ -3,6 +3,7 @@ FILES_FOLDER_NAME = "/files/"
 CONFIG_FOLDER_NAME = "/.config/"
 NEXT_EDGELIST_JOB_FNAME = "next_edgelist_job_num.txt"
 TWITTER_IDS_FNAME = "twitter_ids.csv"
+TWITTER_IDS_BIN_FNAME = "twitter_ids.bin"
 TWITTER_IDS_FAILED_FNAME = "twitter_ids_failed.csv"
 TWITTER_IDS_ORIGINAL_FNAME = "twitter_ids_og.csv"
 EDGELIST_FNAME = "edgelist.csv"
@@ -10,3 +11,47 @@ EDGELIST_FAILED_FNAME = "edgelist_failed.csv"
 NEXT_CHUNK_START_FNAME = "next_chunk_start.txt"
 CONCAT_FNAME = "concat.txt"
 TWITTER_AUTH_FNAME = ".twitter_auth.json"
+RATE_LIMIT_WINDOW = 15 * 60
+# Requests per rate-limit window for app (bearer token) auth, per API v1.1 endpoint
+RATE_LIMITS = {
+    "friends/ids": 15,
+    "users/show": 900,
+    "users/lookup": 300,
+    "search/tweets": 450,
+}
+USERS_LOOKUP_BATCH_SIZE = 100
+# Maximum number of tweets per search/tweets request
+SEARCH_PAGE_SIZE = 100
+CACHE_FNAME = "cache.sqlite"
+# Time-to-live of cached API results, in seconds
+CACHE_TTL = {
+    "friends/ids": 7 * 24 * 60 * 60,
+    "users": 24 * 60 * 60,
+    "users_by_screen_name": 24 * 60 * 60,
+}
+CACHE_MAX_ENTRIES = 500000
+# Share of CACHE_MAX_ENTRIES kept after an eviction, so that evictions (and the table count they start with) are rare
+CACHE_EVICTION_TARGET = 0.9
+EDGELIST_BIN_FNAME = "edgelist.bin"
+PROGRESS_LOG_FNAME = "progress_log.csv"
+# Per-job JSON-lines log of the metrics of every run, and prefix of the Prometheus textfile of each script
+METRICS_LOG_FNAME = "metrics.jsonl"
+PROMETHEUS_FNAME_PREFIX = "twitnet_"
+# Merged, deduplicated edges of a job and the jobs concatenated with it, and how much of each edgelist file it includes
+EDGE_INDEX_FNAME = "edge_index.bin"
+EDGE_INDEX_MANIFEST_FNAME = "edge_index.json"
+# Number of buffered edges after which the crawler appends them to the binary edgelist
+EDGE_FLUSH_SIZE = 100000
+# Number of explored users, or seconds, after which the crawler also flushes edges and commits its progress
+PROGRESS_COMMIT_STEPS = 100
+PROGRESS_COMMIT_INTERVAL = 60
+# Largest graph for which discover.py uses Girvan-Newman community detection by default
+GIRVAN_NEWMAN_MAX_NODES = 300
+# Rough number of graph operations per second, used to estimate the run time of exact network metrics
+OPS_PER_SECOND = 1000000
+# Graphs with more nodes are visualized with the large-graph layout and rasterized rendering
+LARGE_GRAPH_MIN_NODES = 2000
+LARGE_GRAPH_TOP_K_LABELS = 50
+LAYOUT_CACHE_FNAME = "layout.npz"
+# Maximum number of users explored at once by crawl.py --async
+ASYNC_MAX_IN_FLIGHT = 8
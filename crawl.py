@@ -0,0 +1,311 @@
+#!/usr/local/bin/python3
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import gmtime, strftime
+from constants import ASYNC_MAX_IN_FLIGHT, USERS_LOOKUP_BATCH_SIZE
+from process_chunk import check_user, load_crontab_job_num
+from utils.edge_store import EdgeWriter
+from utils.id_store import IdStore
+from utils.metrics import metrics
+from utils.job_load import get_edgelist_job_dir_path
+from utils.fetch import get_friend_ids, prefetch_users
+from utils.progress_log import ProgressLog
+from utils.rate_limit import rate_limiter
+from utils.twitter_auth import get_twitter_api
+
+
+@metrics.timed("chunk_load")
+def load_id_list(job_dir):
+    """
+    Load the full ID list of a job once, so it can be kept in memory for the whole crawl.
+    """
+    ids = IdStore(job_dir).read()
+    print(
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded {len(ids)} IDs from ID list"
+    )
+    return ids
+
+
+def explore_id(api, id, friends_limit=15000, cursor=-1):
+    """
+    Page through all friends of a user, starting at `cursor` (e.g. left by process_chunk.py).
+    Return the friend IDs and an error message (empty on success).
+    """
+    if cursor == -1:
+        friends_count, error_message = check_user(api, id, friends_limit=friends_limit)
+        if error_message or friends_count == 0:
+            return [], error_message
+    friend_ids = []
+    while True:
+        try:
+            res = get_friend_ids(api, id, cursor=cursor)
+        except Exception as e:
+            print("Exception:", repr(str(e)))
+            return [], str(e).split("\n")[0]
+        friend_ids.extend(res[0])
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted {len(res[0])} friends of ID {id}"
+        )
+        next_cursor = res[1][1]
+        if next_cursor == 0:
+            return friend_ids, ""
+        cursor = next_cursor
+
+
+def open_job(job_dir):
+    """
+    Load a job for crawling, resuming from its progress log. The `job` dict holds the job's dir, ID list,
+    index of the next ID to explore, progress log and edge writer.
+    """
+    ids = load_id_list(job_dir)
+    progress_log = ProgressLog(job_dir)
+    job = {
+        "job_dir": job_dir,
+        "ids": ids,
+        "next": progress_log.committed,
+        # Index up to which users are looked up in advance
+        "prefetched": progress_log.committed,
+        "n_explored": 0,
+        "n_failed": 0,
+        "progress_log": progress_log,
+        # Truncates edges left after the last committed step by an interrupted run
+        "writer": EdgeWriter(job_dir, progress_log=progress_log),
+    }
+    skip_done(job)
+    print(
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tCrawling IDs {job['next']} to {len(ids)} of job dir {job_dir}"
+    )
+    return job
+
+
+def skip_done(job):
+    """
+    Move the index of the next ID to explore past IDs already done in a previous run.
+    """
+    while job["next"] < len(job["ids"]) and job["progress_log"].is_done(job["next"]):
+        job["next"] += 1
+    return 0
+
+
+def close_jobs(jobs, sent_before=0):
+    """
+    Flush the edges of finished jobs and commit their progress.
+    """
+    for job in jobs:
+        job["writer"].flush()
+        print(
+            f"Explored {job['n_explored']} users of job dir {job['job_dir']}. {job['n_failed']} users were excluded"
+        )
+    print(f"Sent {rate_limiter.sent.get('friends/ids', 0) - sent_before} requests")
+    print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tJobs crawled")
+    return 0
+
+
+def record_result(job, index, friend_ids, error_message):
+    """
+    Record the friends of the ID at `index` of a job, or its failure. Results can arrive out of order.
+    The step is committed to the progress log together with its edges, on the writer's next flush
+    (when enough edges or steps are buffered, or enough time has passed).
+    """
+    id = job["ids"][index]
+    job["n_explored"] += 1
+    if error_message:
+        job["n_failed"] += 1
+        job["progress_log"].record(index, id, "failed", error_message=error_message)
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tFailed to load friends of ID {id}"
+        )
+    else:
+        job["writer"].write_edges(id, friend_ids)
+        job["progress_log"].record(index, id, "done")
+    return job["writer"].flush_if_due()
+
+
+def prefetch_next_users(api, job):
+    """
+    Look up the next batch of pending users of a job once exploration reaches them, so that their
+    friends_count is checked from the cache instead of costing a users/show request each.
+    """
+    if job["next"] < job["prefetched"]:
+        return 0
+    pending = [
+        index
+        for index in range(job["next"], min(job["next"] + USERS_LOOKUP_BATCH_SIZE, len(job["ids"])))
+        if not job["progress_log"].is_done(index)
+    ]
+    prefetch_users(api, [job["ids"][index] for index in pending])
+    job["prefetched"] = job["next"] + USERS_LOOKUP_BATCH_SIZE
+    return 0
+
+
+def take_next_index(job):
+    """
+    Take the index of the next ID to explore from a job.
+    """
+    index = job["next"]
+    job["next"] += 1
+    skip_done(job)
+    return index
+
+
+def explore_next_id(api, job, friends_limit=15000):
+    """
+    Explore the next pending ID of a job and record the result.
+    """
+    prefetch_next_users(api, job)
+    index = take_next_index(job)
+    print(f"Selected ID: {job['ids'][index]} (job dir {job['job_dir']})")
+    friend_ids, error_message = explore_id(
+        api,
+        job["ids"][index],
+        friends_limit=friends_limit,
+        cursor=job["progress_log"].cursors.get(index, -1),
+    )
+    return record_result(job, index, friend_ids, error_message)
+
+
+def pick_job(jobs, schedule="fair", turn=0):
+    """
+    Pick the job to explore an ID from. With 'fair' scheduling, jobs with pending IDs take turns;
+    with 'priority' scheduling, jobs are finished in the order they were given.
+    """
+    pending = [job for job in jobs if job["next"] < len(job["ids"])]
+    if not pending:
+        return None
+    if schedule == "priority":
+        return pending[0]
+    return pending[turn % len(pending)]
+
+
+def crawl_jobs(api, job_dirs, friends_limit=15000, schedule="fair"):
+    """
+    Explore all remaining IDs of several jobs in a single process, interleaving them under the shared rate limiter.
+    Progress of each job is recorded in its own progress log.
+    """
+    sent_before = rate_limiter.sent.get("friends/ids", 0)
+    jobs = [open_job(job_dir) for job_dir in job_dirs]
+    turn = 0
+    while True:
+        job = pick_job(jobs, schedule=schedule, turn=turn)
+        if job is None:
+            break
+        explore_next_id(api, job, friends_limit=friends_limit)
+        turn += 1
+    return close_jobs(jobs, sent_before=sent_before)
+
+
+async def crawl_jobs_async(
+    api, job_dirs, friends_limit=15000, schedule="fair", max_in_flight=ASYNC_MAX_IN_FLIGHT
+):
+    """
+    Like crawl_jobs, but keep up to `max_in_flight` users in exploration at once, so that network latency
+    and rate-limit waits of different endpoints and credentials overlap. The pages of one user are still
+    requested in order, as each cursor comes from the previous page. Results go through a queue to a single
+    writer task, which owns the edge writers and progress logs. If an exploration or the writer fails, the
+    other tasks are cancelled and the error is raised; steps already committed stay in the progress logs.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max_in_flight))
+    # Lookups run on their own thread, so they don't take a worker from the explorations
+    prefetch_executor = ThreadPoolExecutor(max_workers=1)
+    sent_before = rate_limiter.sent.get("friends/ids", 0)
+    jobs = [open_job(job_dir) for job_dir in job_dirs]
+    results = asyncio.Queue(maxsize=2 * max_in_flight)
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def explore(job, index):
+        try:
+            # tweepy.API is synchronous, so each exploration runs in a worker thread
+            friend_ids, error_message = await asyncio.to_thread(
+                explore_id,
+                api,
+                job["ids"][index],
+                friends_limit,
+                job["progress_log"].cursors.get(index, -1),
+            )
+        finally:
+            in_flight.release()
+        await results.put((job, index, friend_ids, error_message))
+
+    async def write():
+        while True:
+            result = await results.get()
+            if result is None:
+                return 0
+            record_result(*result)
+
+    writer = asyncio.create_task(write())
+    tasks = set()
+    errors = []
+
+    def on_done(task):
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    try:
+        turn = 0
+        while not errors and not writer.done():
+            job = pick_job(jobs, schedule=schedule, turn=turn)
+            if job is None:
+                break
+            await loop.run_in_executor(prefetch_executor, prefetch_next_users, api, job)
+            index = take_next_index(job)
+            await in_flight.acquire()
+            task = asyncio.create_task(explore(job, index))
+            tasks.add(task)
+            task.add_done_callback(on_done)
+            turn += 1
+        # Wait for the explorations in flight, stopping as soon as one of them or the writer fails
+        while tasks and not errors and not writer.done():
+            await asyncio.wait(tasks | {writer}, return_when=asyncio.FIRST_COMPLETED)
+        if errors:
+            raise errors[0]
+        if not writer.done():
+            # The queue can be full, so stop the writer without waiting on it if it fails first
+            stop = asyncio.create_task(results.put(None))
+            tasks.add(stop)
+            await asyncio.wait({stop, writer}, return_when=asyncio.FIRST_COMPLETED)
+        await writer
+    finally:
+        writer.cancel()
+        for task in list(tasks):
+            task.cancel()
+        prefetch_executor.shutdown(wait=False)
+    return close_jobs(jobs, sent_before=sent_before)
+
+
+def crawl_job(api, job_dir, friends_limit=15000):
+    """
+    Explore all remaining IDs of a job in a single process, sleeping only as long as the rate limiter requires.
+    """
+    return crawl_jobs(api, [job_dir], friends_limit=friends_limit)
+
+
+def main(job_nums=[], schedule="fair", friends_limit=15000, use_async=False, max_in_flight=ASYNC_MAX_IN_FLIGHT):
+    """
+    Crawl the given jobs, or the most recent one, until all their IDs are explored.
+    """
+    api = get_twitter_api()
+    job_nums = job_nums or [load_crontab_job_num()]
+    job_dirs = [get_edgelist_job_dir_path(job_num) for job_num in job_nums]
+    if use_async:
+        asyncio.run(
+            crawl_jobs_async(
+                api,
+                job_dirs,
+                friends_limit=friends_limit,
+                schedule=schedule,
+                max_in_flight=max_in_flight,
+            )
+        )
+    else:
+        crawl_jobs(api, job_dirs, friends_limit=friends_limit, schedule=schedule)
+    return metrics.export("crawl", job_dirs=job_dirs)
+
+
+if __name__ == "__main__":
+    from twitnet import main as twitnet
+
+    twitnet(["crawl", *sys.argv[1:]])
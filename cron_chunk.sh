@@ -1,2 +1,2 @@
 #!/bin/sh
-/usr/local/bin/python3 process_chunk.py
\ No newline at end of file
+/usr/local/bin/python3 twitnet.py crawl --chunk
@@ -1,8 +1,12 @@
+import sys
 from time import gmtime, strftime
+import numpy as np
 import pandas as pd
 import networkx as nx
 from networkx.algorithms import community
+from constants import GIRVAN_NEWMAN_MAX_NODES
 from utils.filter_edgelist import filter_out_outsiders
+from utils.metrics import metrics
 from utils.job_load import (
     get_edgelist_job_dir_path,
     get_job_num,
@@ -10,22 +14,7 @@ from utils.job_load import (
 )
 
 
-def get_in_degree_centrality(G, n=-1):
-    """
-    Compute in-degree centrality and return a Series of nodes' in-degree centrality. Use n for top N nodes, and n=-1 for all nodes.
-    """
-    d = dict(G.in_degree())
-    data = {"id_str": [], "in_degree": []}
-    for node, in_degree in d.items():
-        data["id_str"].append(node)
-        data["in_degree"].append(in_degree)
-    if n == -1:
-        df = pd.DataFrame(data).sort_values(by="in_degree", ascending=False)
-    else:
-        df = pd.DataFrame(data).sort_values(by="in_degree", ascending=False).head(n)
-    return df
-
-
+@metrics.timed("graph_build")
 def initialize_graph(edgelist):
     """
     Initialize and return NetworkX graph object. edgelist must be a DataFrame with columns 'source' and 'target'
@@ -46,60 +35,85 @@ def get_cutoff_perc():
     try:
         return float(input("Specify cutoff percentile (e.g. 0.8, 0.66, 0.5): "))
     except:
-        get_cutoff_perc()
+        return get_cutoff_perc()
+
+
+@metrics.timed("community_detection")
+def detect_communities(Gf, method="auto"):
+    """
+    Detect communities in graph Gf and return them as a list of sets of nodes. Methods:
+    'girvan_newman' (based on betweenness centrality, only feasible for small graphs), 'louvain' (modularity optimization),
+    'label_propagation' (fastest), or 'auto' (Girvan-Newman for graphs of up to GIRVAN_NEWMAN_MAX_NODES nodes, Louvain otherwise).
+    """
+    if method == "auto":
+        method = "girvan_newman" if Gf.number_of_nodes() <= GIRVAN_NEWMAN_MAX_NODES else "louvain"
+    if method == "girvan_newman":
+        communities = list(next(community.girvan_newman(Gf)))
+    elif method == "louvain":
+        communities = community.louvain_communities(Gf, seed=0)
+    elif method == "label_propagation":
+        communities = list(community.label_propagation_communities(Gf.to_undirected()))
+    else:
+        raise ValueError(f"Unknown community detection method: {method}")
+    print(
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tDetected {len(communities)} communities using {method}"
+    )
+    return communities
 
 
-def explore_graph(Gf, edgelist, cutoff_perc, min_community_size=3):
+def get_community_in_degrees(community_of, edgelist):
+    """
+    Compute in-degrees of targets within each community in a single pass over the edgelist. `community_of` is a Series mapping community members to community labels.
+    Return a DataFrame with columns `community`, `id_str` and `in_degree`, where in-degree is the number of distinct community members following `id_str`.
+    """
+    # Keep edges from community members, labelled with the source's community
+    comm_edgelist = edgelist.assign(community=edgelist["source"].map(community_of))
+    comm_edgelist = comm_edgelist.dropna(subset=["community"]).drop_duplicates(
+        subset=["source", "target"]
+    )
+    print(f"Length of community edgelist: {len(comm_edgelist)}")
+    # Count (community, target) pairs
+    in_degrees = (
+        comm_edgelist.groupby(["community", "target"]).size().reset_index(name="in_degree")
+    )
+    in_degrees["community"] = in_degrees["community"].astype(np.int64)
+    return in_degrees.rename(columns={"target": "id_str"})
+
+
+def explore_graph(Gf, edgelist, cutoff_perc, job_dir, job_num, min_community_size=3, method="auto"):
     """
     Explore graph and record results.
     """
-    # Detect communities using the Girvan-Newman algorithm (based on betweenness centrality)
-    communities_generator = community.girvan_newman(Gf)
-    to_explore = set()
-    failed = set()
-
-    for comm in next(communities_generator):
-        # From edgelist, filter out sources not in the community, keep outsiders
-        comm_member_set = set(comm)
-        comm_edgelist = edgelist[
-            edgelist["source"].apply(lambda x: x in comm_member_set)
-        ]
-        print(f"Length of community edgelist: {len(comm_edgelist)}")
-        G_comm = nx.from_pandas_edgelist(
-            comm_edgelist, source="source", target="target", create_using=nx.DiGraph
-        )
-        in_deg_cent = get_in_degree_centrality(G_comm)
-        in_deg_cutoff = cutoff_perc * len(comm_member_set)
-        print(f"Community size: {len(comm_member_set)}")
-        print(f"In-degree cutoff: {round(in_deg_cutoff, 2)}")
-        in_deg_cent_cutoff = in_deg_cent[in_deg_cent["in_degree"] > (in_deg_cutoff)]
-        print(
-            f"Number of members before filtering out community members: {len(in_deg_cent_cutoff)}"
-        )
-        if (len(in_deg_cent_cutoff) == 0):
-            print("There are no users to explore")
-        else:
-            # Compute user IDs to explore--filter out community members
-            in_deg_cent_cutoff_f = in_deg_cent_cutoff[
-                in_deg_cent_cutoff["id_str"].apply(lambda x: x not in comm_member_set)
-            ]
-            if len(comm) < min_community_size:
-                failed.update(in_deg_cent_cutoff_f["id_str"])
-                print(
-                    f"Excluded {len(in_deg_cent_cutoff_f['id_str'])} users from exploration because of the community's small size ({len(comm)})"
-                )
-            else:
-                to_explore.update(in_deg_cent_cutoff_f["id_str"])
-                print(f"Added {len(in_deg_cent_cutoff_f)} users for exploration from community")
+    communities = detect_communities(Gf, method=method)
+    sizes = np.array([len(comm) for comm in communities])
+    # Map each community member to its community label
+    community_of = pd.Series(
+        np.repeat(np.arange(len(communities)), sizes),
+        index=np.fromiter((node for comm in communities for node in comm), dtype=np.int64),
+    )
+    in_degrees = get_community_in_degrees(community_of, edgelist)
+
+    # Apply the cutoff to all communities at once
+    in_deg_cutoff = cutoff_perc * sizes[in_degrees["community"].to_numpy()]
+    in_degrees = in_degrees[in_degrees["in_degree"] > in_deg_cutoff]
+    print(f"Number of members before filtering out community members: {len(in_degrees)}")
+    # Compute user IDs to explore--filter out members of the community that follows them
+    in_degrees = in_degrees[in_degrees["id_str"].map(community_of) != in_degrees["community"]]
+    is_small = sizes[in_degrees["community"].to_numpy()] < min_community_size
+    failed = set(in_degrees["id_str"][is_small])
+    to_explore = set(in_degrees["id_str"][~is_small])
+    print(
+        f"Excluded {len(failed)} users from exploration because of the small size of their communities (under {min_community_size})"
+    )
     fname = f"{job_dir}discover_{job_num}_{str(cutoff_perc).replace('.', '_')}.csv"
     with open(fname, "w") as f:
-        f.writelines([i + "\n" for i in to_explore])
+        f.writelines([f"{i}\n" for i in to_explore])
 
     failed_fname = (
         f"{job_dir}discover_failed_{job_num}_{str(cutoff_perc).replace('.', '_')}.csv"
     )
     with open(failed_fname, "w") as f:
-        f.writelines([i + "\n" for i in failed])
+        f.writelines([f"{i}\n" for i in failed])
     print(f"In total, added {len(to_explore)} users for exploration from all communities")
     print(
         f"Now run load.py, select option c (IDs from file) and paste this filename\n\n{fname}\n\nThen, select 0 (initial set only)"
@@ -108,16 +122,30 @@ def explore_graph(Gf, edgelist, cutoff_perc, min_community_size=3):
     return 0
 
 
-job_num = get_job_num()
-job_dir = get_edgelist_job_dir_path(job_num)
+def main(job_num=None, cutoff_perc=None, method="auto"):
+    """
+    Find users followed by a large share of a community of a job, to explore next. The job number and the cutoff
+    percentile are asked for if not given.
+    """
+    if job_num is None:
+        job_num = get_job_num()
+    job_dir = get_edgelist_job_dir_path(job_num)
+
+    # Use unfiltered edgelist for exploration
+    edgelist = load_edgelist(job_dir)
+
+    # Use filtered edgelist (no outsiders) for community detection
+    filtered = filter_out_outsiders(edgelist)
+    Gf = initialize_graph(filtered)
+
+    # Explore graph
+    if cutoff_perc is None:
+        cutoff_perc = get_cutoff_perc()
+    explore_graph(Gf, edgelist, cutoff_perc, job_dir, job_num, min_community_size=3, method=method)
+    return metrics.export("discover", job_dirs=[job_dir])
 
-# Use unfiltered edgelist for exploration
-edgelist = load_edgelist(job_dir)
 
-# Use filtered edgelist (no outsiders) for community detection
-filtered = filter_out_outsiders(edgelist)
-Gf = initialize_graph(filtered)
+if __name__ == "__main__":
+    from twitnet import main as twitnet
 
-# Explore graph
-cutoff_perc = get_cutoff_perc()
-explore_graph(Gf, edgelist, cutoff_perc, min_community_size=3)
+    twitnet(["discover", *sys.argv[1:]])
@@ -1,11 +1,12 @@
 import json
 import os
+import sys
 from time import gmtime, strftime
 from constants import CONFIG_FOLDER_NAME, EDGELIST_JOBS_FOLDER_NAME, FILES_FOLDER_NAME, NEXT_EDGELIST_JOB_FNAME, TWITTER_AUTH_FNAME
 from utils.twitter_auth import get_twitter_api
 
 
-def initialize_app(bearer_token=""):
+def initialize_app(bearer_tokens=[]):
     """
     Create all necessary folders.
     """
@@ -23,10 +24,10 @@ def initialize_app(bearer_token=""):
     config_path = f"{os.path.abspath(os.getcwd())}{CONFIG_FOLDER_NAME}"
     os.mkdir(config_path)
 
-    # Save bearer token
+    # Save bearer token(s). Requests are spread over all tokens
     bearer_token_fname = f"{config_path}{TWITTER_AUTH_FNAME}"
     with open(bearer_token_fname, "w") as f:
-        obj = {"bearer_token": bearer_token}
+        obj = {"bearer_token": bearer_tokens[0] if bearer_tokens else "", "bearer_tokens": bearer_tokens}
         json.dump(obj, f)
 
     # Create files dir
@@ -37,14 +38,27 @@ def initialize_app(bearer_token=""):
     return 0
 
 
-bearer_token = input("Provide your Twitter bearer token token. Click Enter to skip\n")
-if bearer_token:
-    try:
-        # Verify bearer token
-        api = get_twitter_api(bearer_token=bearer_token)
-        api.verify_credentials()
-        initialize_app(bearer_token=bearer_token)
-    except:
-        initialize_app()
-else:
-    initialize_app()
+def main(bearer_tokens=None):
+    """
+    Verify bearer tokens (prompting for them if not given) and initialize the app with the valid ones.
+    """
+    if bearer_tokens is None:
+        bearer_tokens = input(
+            "Provide your Twitter bearer token(s), separated by whitespace. Click Enter to skip\n"
+        ).split()
+    verified = []
+    for bearer_token in bearer_tokens:
+        try:
+            # Verify bearer token
+            api = get_twitter_api(bearer_token=bearer_token)
+            api.verify_credentials()
+            verified.append(bearer_token)
+        except:
+            pass
+    return initialize_app(bearer_tokens=verified)
+
+
+if __name__ == "__main__":
+    from twitnet import main as twitnet
+
+    twitnet(["init", *sys.argv[1:]])
@@ -1,16 +1,21 @@
 import os
-from time import sleep, gmtime, strftime
+import sys
+from time import gmtime, strftime
 import csv
+from collections import Counter
 from constants import (
     CONCAT_FNAME,
     EDGELIST_FNAME,
     EDGELIST_JOBS_FOLDER_NAME,
     NEXT_EDGELIST_JOB_FNAME,
     TWITTER_IDS_FAILED_FNAME,
-    TWITTER_IDS_FNAME,
     TWITTER_IDS_ORIGINAL_FNAME,
 )
+from process_chunk import check_user
+from utils.id_store import IdStore
 from utils.job_load import get_edgelist_job_dir_path
+from utils.fetch import get_all_friend_ids, lookup_users, prefetch_users
+from utils.metrics import metrics
 from utils.twitter_auth import get_twitter_api
 
 
@@ -22,7 +27,7 @@ def pick_route():
         "Select source\n\ta : Twitter username(s)\n\tb : Twitter username list (CSV, TXT)\n\tc : Twitter ID list (CSV, TXT)\nType 'a', 'b' or 'c': "
     )
     if entered not in ["a", "b", "c"]:
-        pick_route()
+        return pick_route()
     else:
         print(
             f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tSelected app route {entered}"
@@ -40,18 +45,19 @@ def get_usernames_from_input():
         .split()
     )
     if not usernames:
-        get_usernames_from_input()
+        return get_usernames_from_input()
     else:
         return usernames
 
 
-def get_usernames_from_file():
+def get_usernames_from_file(path=""):
     """
-    Load list of Twitter usernames from file. Note: CSV or TXT file must not have a header row.
+    Load list of Twitter usernames from file, asking for its path if not given. Note: CSV or TXT file must not have a header row.
     """
-    path = input("Provide file path for Twitter username list:\n")
+    if not path:
+        path = input("Provide file path for Twitter username list:\n")
     if not path or not os.path.exists(path):
-        get_usernames_from_file()
+        return get_usernames_from_file()
     else:
         with open(path, "r") as f:
             usernames = [line.replace("@", "").strip()
@@ -63,27 +69,22 @@ def get_ids_from_usernames(api, usernames):
     """
     Find the user's Twitter ID by username.
     """
-    failed = set()
+    # Usernames are case-insensitive, so duplicates and case variants are looked up (and counted) once
+    usernames = list(dict.fromkeys(username.lower() for username in usernames))
+    n_failed = 0
     # Make directory for new edgelist job and load its path
     job_num = make_edgelist_job_dir()
     job_dir = get_edgelist_job_dir_path(job_num)
-    loaded_path = f"{job_dir}{TWITTER_IDS_FNAME}"
+    id_store = IdStore(job_dir)
     failed_path = f"{job_dir}{TWITTER_IDS_FAILED_FNAME}"
-    with open(loaded_path, "a") as f:
-        writer = csv.writer(f)
-        for username in usernames:
-            # Attempt to load user object and get ID
-            try:
-                user = api.get_user(screen_name=username)
-                # Write it to CSV
-                writer.writerow([user.id])
-            except:
-                failed.add(username)
-            sleep(0.2)
-    if failed:
-        handle_failed(failed, failed_path)
+    # Load user objects in batches and add their IDs to the ID store
+    for users, failed in lookup_users(api, screen_names=usernames):
+        id_store.add(user["id_str"] for user in users)
+        if failed:
+            handle_failed(failed, failed_path)
+            n_failed += len(failed)
     print(
-        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded and recorded IDs for {len(usernames)} usernames"
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded and recorded IDs for {len(usernames) - n_failed} of {len(usernames)} usernames"
     )
     return job_num
 
@@ -102,29 +103,29 @@ def handle_failed(failed, failed_path):
     return 0
 
 
-def get_ids_from_file():
+def get_ids_from_file(path=""):
     """
-    Load list of Twitter IDs from file. Note: CSV or TXT file must not have a header row.
+    Load list of Twitter IDs from file, asking for its path if not given. Note: CSV or TXT file must not have a header row.
     """
-    path = input("Provide local file path for Twitter ID list:\n")
+    if not path:
+        path = input("Provide local file path for Twitter ID list:\n")
     if not path or not os.path.exists(path):
         print("File not found")
-        get_ids_from_file()
+        return get_ids_from_file()
     else:
         # Check the number of columns in the first line
         with open(path, "r") as f:
             n_cols = len(f.readline().split(","))
         if n_cols != 1:
             print("File has more than one column (commas found)")
-            get_ids_from_file()
+            return get_ids_from_file()
         else:
             job_num = make_edgelist_job_dir()
             job_dir = get_edgelist_job_dir_path(job_num)
-            # Copy file, wait for copying to execute
-            os.popen(f"cp {path} {job_dir}{TWITTER_IDS_FNAME}")
-            sleep(1)
+            with open(path, "r") as f:
+                n_added = IdStore(job_dir).add(line.strip() for line in f if line.strip())
             print(
-                f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded and recorded IDs from ID file"
+                f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded and recorded {n_added} unique IDs from ID file"
             )
             return job_num
 
@@ -150,45 +151,86 @@ def make_edgelist_job_dir():
     return num
 
 
-def expand_network(api, job_dir):
+def get_level_cap():
     """
-    Optionally expand the network, adding users followed by users from the original set.
+    Input the maximum number of IDs added per level of expansion.
     """
-    depth = input(
-        "Select ID set(s) to include (depth)\n\t0 : initial ID set only\n\t1 : all neighbors of initial ID set\nDepth '1' is not recommended for sets of over 15 members\nEnter '0' or '1'\n"
+    level_cap = input(
+        "Specify the maximum number of IDs to add per level (the ones followed by the most users of the previous level are kept), or click Enter for no limit:\n"
     )
-    if not depth:
-        depth = "0"
-    if depth in ["0", "1"]:
-        if depth == "1":
-            # Copy IDs file of the original set
-            os.popen(
-                f"cp {job_dir}{TWITTER_IDS_FNAME} {job_dir}{TWITTER_IDS_ORIGINAL_FNAME}"
-            )
-            sleep(1)
+    if not level_cap:
+        return None
+    try:
+        return int(level_cap)
+    except:
+        return get_level_cap()
+
+
+def expand_frontier(api, id_store, depth, level_cap=None, friends_limit=15000):
+    """
+    Expand the ID list breadth-first, `depth` levels deep. Each level is the set of accounts followed by users of the
+    previous level that aren't in the ID list yet, ranked by how many of those users follow them and cut at `level_cap`.
+    Every account is added once, and friend lists are paged in full (and cached, so the crawl doesn't request them again).
+    Like in the crawl, users who follow over `friends_limit` accounts or are protected are skipped, checked from a
+    users/lookup per 100 users of the level.
+    """
+    seen = set(id_store.read())
+    level = id_store.read()
+    for d in range(1, depth + 1):
+        n_followers = Counter()
+        prefetch_users(api, level)
+        for id in level:
+            friends_count, error_message = check_user(api, id, friends_limit=friends_limit)
+            if error_message or friends_count == 0:
+                continue
+            try:
+                friend_ids = get_all_friend_ids(api, id)
+            except Exception as e:
+                print("Exception:", repr(str(e)))
+                print(f"Failed to load friends of user {id}")
+                continue
+            n_followers.update(set(friend_ids) - seen)
             print(
-                f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tCopied {TWITTER_IDS_FNAME}"
+                f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted {len(friend_ids)} accounts followed by user {id}"
             )
-            with open(f"{job_dir}{TWITTER_IDS_FNAME}", "r") as f:
-                chunk = [line.strip() for line in list(f.readlines())]
-            with open(f"{job_dir}{TWITTER_IDS_FNAME}", "a") as f:
-                for id in chunk:
-                    try:
-                        friend_ids = api.get_friend_ids(
-                            user_id=id, stringify_ids=True)
-                        for friend_id in friend_ids:
-                            f.write(f"{friend_id}\n")
-                        print(
-                            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted {len(friend_ids)} accounts followed by user {id}, appended them to twitter_ids.csv"
-                        )
-                        # Ensure rate limit is not exceeded
-                        sleep(2)
-                    except:
-                        print(f"Failed to load friends of user {id}")
-            return 0
-        return 0
-    else:
-        expand_network()
+        level = [id for id, _ in n_followers.most_common(level_cap)]
+        n_added = id_store.add(level)
+        seen.update(level)
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tAdded {n_added} of {len(n_followers)} new accounts at depth {d}"
+        )
+        if not level:
+            break
+    return 0
+
+
+def expand_network(api, job_dir, depth=None, level_cap=None, friends_limit=15000):
+    """
+    Optionally expand the network, adding users followed by users from the original set (and so on, for depth over 1).
+    If the depth isn't given, it's asked for, and so is the maximum number of IDs added per level.
+    """
+    interactive = depth is None
+    if interactive:
+        depth = input(
+            "Select ID set(s) to include (depth)\n\t0 : initial ID set only\n\t1 : all neighbors of initial ID set\n\t2 or more : neighbors of neighbors, and so on\nDepth '1' is not recommended for sets of over 15 members without a limit per level\nEnter depth\n"
+        )
+    depth = str(depth)
+    if not depth:
+        depth = "0"
+    if not depth.isdigit():
+        return expand_network(api, job_dir, friends_limit=friends_limit)
+    if int(depth) > 0:
+        # Record IDs of the original set
+        id_store = IdStore(job_dir)
+        with open(f"{job_dir}{TWITTER_IDS_ORIGINAL_FNAME}", "w") as f:
+            f.writelines([f"{id}\n" for id in id_store.read()])
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tRecorded original ID set in {TWITTER_IDS_ORIGINAL_FNAME}"
+        )
+        if interactive:
+            level_cap = get_level_cap()
+        expand_frontier(api, id_store, int(depth), level_cap=level_cap, friends_limit=friends_limit)
+    return 0
 
 
 def calculate_maximum_completion_time(job_dir, chunk_size=14):
@@ -196,8 +238,7 @@ def calculate_maximum_completion_time(job_dir, chunk_size=14):
     Estimate maximum time to complete data collection.
     """
     # Compute size of entire network
-    with open(f"{job_dir}{TWITTER_IDS_FNAME}", "r") as f:
-        size = len(f.readlines())
+    size = len(IdStore(job_dir))
     # Compute estimated time to complete (in hours)
     interval = chunk_size + 1
     if size < interval:
@@ -242,10 +283,10 @@ def concat_edgelists(job_dir_a, job_dir_b):
         with open(concat_b_fname, "r") as f:
             concat_b.extend(f.readlines())
 
-    # Verify that filenames in concat_b are correct
+    # Verify that job dirs of edgelists in concat_b exist
     for i in concat_b:
         try:
-            if not os.path.exists(i.strip()):
+            if not os.path.exists(os.path.dirname(i.strip())):
                 raise Exception("Incorrect filename")
         except Exception as e:
             print("Exception:", e)
@@ -265,24 +306,43 @@ def concat_edgelists(job_dir_a, job_dir_b):
     return 0
 
 
-route = pick_route()
-api = get_twitter_api()
-if route == "a":
-    usernames = get_usernames_from_input()
-    job_num = get_ids_from_usernames(api, usernames)
-    job_dir = get_edgelist_job_dir_path(job_num)
-elif route == "b":
-    usernames = get_usernames_from_file()
-    job_num = get_ids_from_usernames(api, usernames)
-    job_dir = get_edgelist_job_dir_path(job_num)
-else:
-    job_num = get_ids_from_file()
+def main(
+    usernames=[], usernames_file="", ids_file="", concat_job_num=None, depth=None, level_cap=None, friends_limit=15000
+):
+    """
+    Create a job from Twitter usernames, a username file or an ID file, expand it to the given depth and print how
+    to schedule its crawl. Without a source, the source is asked for, and so is the concatenation for an ID list.
+    If the depth isn't given, it's asked for together with the maximum number of IDs added per level.
+    """
+    api = get_twitter_api()
+    interactive = not (usernames or usernames_file or ids_file)
+    if interactive:
+        route = pick_route()
+        if route == "a":
+            usernames = get_usernames_from_input()
+        elif route == "b":
+            usernames = get_usernames_from_file()
+    elif usernames_file:
+        usernames = get_usernames_from_file(usernames_file)
+    if usernames:
+        job_num = get_ids_from_usernames(api, usernames)
+    else:
+        job_num = get_ids_from_file(ids_file)
     job_dir = get_edgelist_job_dir_path(job_num)
-    job_num_b_input = input(
-        "Concatenate edgelist from existing job? Specify job number or click Enter to skip:\n")
-    if job_num_b_input:
-        job_dir_b = get_edgelist_job_dir_path(int(job_num_b_input))
-        concat_edgelists(job_dir, job_dir_b)
-expand_network(api, job_dir)
-calculate_maximum_completion_time(job_dir, chunk_size=14)
-help_setup_crontab(job_dir)
+    if interactive and route == "c" and concat_job_num is None:
+        job_num_b_input = input(
+            "Concatenate edgelist from existing job? Specify job number or click Enter to skip:\n")
+        if job_num_b_input:
+            concat_job_num = int(job_num_b_input)
+    if concat_job_num is not None:
+        concat_edgelists(job_dir, get_edgelist_job_dir_path(concat_job_num))
+    expand_network(api, job_dir, depth=depth, level_cap=level_cap, friends_limit=friends_limit)
+    calculate_maximum_completion_time(job_dir, chunk_size=14)
+    help_setup_crontab(job_dir)
+    return metrics.export("load", job_dirs=[job_dir])
+
+
+if __name__ == "__main__":
+    from twitnet import main as twitnet
+
+    twitnet(["load", *sys.argv[1:]])
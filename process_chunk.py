@@ -1,17 +1,13 @@
 #!/usr/local/bin/python3
-import os
-from time import sleep, gmtime, strftime
-import csv
-import pandas as pd
-from constants import (
-    EDGELIST_FAILED_FNAME,
-    EDGELIST_FNAME,
-    EDGELIST_JOBS_FOLDER_NAME,
-    NEXT_CHUNK_START_FNAME,
-    NEXT_EDGELIST_JOB_FNAME,
-    TWITTER_IDS_FNAME,
-)
-from utils.job_load import get_edgelist_job_dir_path
+import sys
+from time import gmtime, strftime
+from utils.job_load import get_edgelist_job_dir_path, get_latest_job_num
+from utils.edge_store import EdgeWriter
+from utils.id_store import IdStore
+from utils.metrics import metrics
+from utils.fetch import get_friend_ids, get_user, prefetch_users
+from utils.progress_log import ProgressLog
+from utils.rate_limit import rate_limiter
 from utils.twitter_auth import get_twitter_api
 
 
@@ -19,150 +15,141 @@ def load_crontab_job_num():
     """
     Load the number of the current crontab job.
     """
-    with open(
-        f"{os.path.abspath(os.getcwd())}{EDGELIST_JOBS_FOLDER_NAME}{NEXT_EDGELIST_JOB_FNAME}",
-        "r",
-    ) as f:
-        job_num = int(f.readline()) - 1
+    job_num = get_latest_job_num()
     print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tProcessing job {job_num}")
     return job_num
 
 
-def load_chunk(job_dir, max_chunk_size=14):
+@metrics.timed("chunk_load")
+def load_chunk(job_dir, progress_log, max_chunk_size=14):
     """
-    Load chunk from the file. The start index of current chunk is specified in a separate file.
+    Load chunk of pending IDs from the job's ID store, as a list of (index, ID) pairs. The chunk starts at the first ID not yet committed in the job's progress log.
+    Only the records of the chunk are read from disk.
     """
-    # Load start index of current chunk
-    fname = f"{job_dir}{NEXT_CHUNK_START_FNAME}"
-    if not os.path.exists(fname):
-        with open(fname, "w") as f:
-            start = 0
-            f.write(str(start))
-    else:
-        with open(fname, "r") as f:
-            start = int(f.readline())
-
-    # Load chunk
-    with open(f"{job_dir}{TWITTER_IDS_FNAME}", "r") as f:
-        lines = list(f.readlines())
-        id_list_len = len(lines)
-        # Make sure start and end don't exceed length of ID list
-        start = min(start, id_list_len)
-        end = min(start + max_chunk_size, id_list_len)
-        chunk = [line.strip() for line in lines[start:end]]
+    id_store = IdStore(job_dir)
+    n_ids = len(id_store)
+    start = min(progress_log.committed, n_ids)
+    chunk = []
+    index = start
+    while index < n_ids and len(chunk) < max_chunk_size:
+        ids = id_store.read(index, index + max_chunk_size)
+        for id in ids:
+            # Skip IDs already done out of order (e.g. by crawl.py --async)
+            if not progress_log.is_done(index) and len(chunk) < max_chunk_size:
+                chunk.append((index, id))
+            index += 1
     print(
         f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded chunk from ID list, starting at line {start} of max size {max_chunk_size}"
     )
     return chunk
 
 
-def process_chunk(api, chunk, job_dir, max_chunk_size=14, friends_limit=15000):
+def check_user(api, id, friends_limit=15000):
+    """
+    Check whether the friends of a user should be requested, using the cached user object (chunks are prefetched
+    with users/lookup, so this usually costs no request). Return a tuple of (number of accounts followed, error message),
+    where the error message is empty if the user can be explored.
+    """
+    try:
+        user = get_user(api, id)
+    except Exception as e:
+        print("Exception:", repr(str(e)))
+        return 0, str(e).split("\n")[0]
+    print(f"User follows {user['friends_count']} accounts")
+    if user["friends_count"] > friends_limit:
+        print(f"User {id} excluded because they follow over {friends_limit} accounts")
+        return user["friends_count"], f"User follows over {friends_limit} accounts"
+    if user.get("protected"):
+        # friends/ids would fail with 401 Unauthorized
+        return user["friends_count"], "Unauthorized: protected account"
+    return user["friends_count"], ""
+
+
+def process_chunk(api, chunk, job_dir, progress_log, max_chunk_size=14, friends_limit=15000):
     """
-    Process chunk of Twitter IDs.
+    Process chunk of Twitter IDs. Each page of friends is recorded in the progress log with the next cursor, so a user whose
+    friends span several pages is resumed from the right page by the next run, and nothing is requested twice.
     """
-    failed = []
-    # Initialize counters
-    req_left = max_chunk_size  # min(max_chunk_size, len(chunk))
-    req_per_id_left = 3
-    cur_cursor = -1
-    explored = set()
-    with open(f"{job_dir}{EDGELIST_FNAME}", "a") as f:
-        writer = csv.writer(f)
-        while len(chunk) > 0 and (req_left > 2 or req_left >= req_per_id_left):
-            id = chunk.pop(0)
+    n_requests = 0
+    n_explored = 0
+    n_failed = 0
+    cursors = dict(progress_log.cursors)
+    with EdgeWriter(job_dir, progress_log=progress_log) as writer:
+        while (
+            len(chunk) > 0
+            and n_requests < max_chunk_size
+            and rate_limiter.get_remaining("friends/ids", api) > 0
+        ):
+            index, id = chunk[0]
+            cursor = cursors.get(index, -1)
             print("Selected ID:", id)
-            res = []
+            if cursor == -1:
+                friends_count, error_message = check_user(api, id, friends_limit=friends_limit)
+                if error_message or friends_count == 0:
+                    # No friends/ids request needed
+                    if error_message:
+                        progress_log.record(index, id, "failed", error_message=error_message)
+                        n_failed += 1
+                    else:
+                        progress_log.record(index, id, "done")
+                        n_explored += 1
+                    chunk.pop(0)
+                    continue
             try:
                 # Explore ID
-                res = api.get_friend_ids(
-                    user_id=id, stringify_ids=True, cursor=cur_cursor
-                )
+                res = get_friend_ids(api, id, cursor=cursor)
                 print(
                     f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted {len(res[0])} friends of ID {id}"
                 )
-                sleep(2)
             except Exception as e:
                 print("Exception:", repr(str(e)))
-                print("Response:", repr(res))
                 print(
                     f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tFailed to load friends of ID {id}"
                 )
-                failed.append(
-                    {"id_str": id, "error_message": str(e).split("\n")[0]})
-            req_left -= 1
+                progress_log.record(index, id, "failed", error_message=str(e).split("\n")[0])
+                n_failed += 1
+                chunk.pop(0)
+                n_requests += 1
+                continue
+            n_requests += 1
 
             # If next cursor isn't 0 (end of following list not reached)
-            is_res_valid = False
-            try:
-                if res[0][0]:
-                    is_res_valid = True
-            except:
-                pass
-                
-            if is_res_valid:
-                if res[1][1] != 0:
-                    if req_per_id_left == 3:
-                        # Get total number of accounts followed by user
-                        user = api.get_user(user_id=id)._json
-                        sleep(1)
-                        print(f"User follows {user['friends_count']} accounts")
-                        if user["friends_count"] > friends_limit:
-                            failed.append(
-                                {"id_str": id, "error_message": f"User follows over {friends_limit} accounts"}
-                            )
-                            print(
-                                f"User {id} excluded because they follow over {friends_limit} accounts")
-                            # Reset cursor and counter
-                            cur_cursor = -1
-                            req_per_id_left = 3
-                        else:
-                            cur_cursor = res[1][1]
-                            chunk.insert(0, id)
-                            req_per_id_left -= 1
-                            for friend_id in res[0]:
-                                writer.writerow([id, friend_id])
-                            explored.add(id)
-                    else:
-                        cur_cursor = res[1][1]
-                        chunk.insert(0, id)
-                        req_per_id_left -= 1
-                        for friend_id in res[0]:
-                            writer.writerow([id, friend_id])
-                        explored.add(id)
-                else:
-                    # Reset counters
-                    cur_cursor = -1
-                    req_per_id_left = 3
-                    for friend_id in res[0]:
-                        writer.writerow([id, friend_id])
-                    explored.add(id)
+            next_cursor = res[1][1]
+            writer.write_edges(id, res[0])
+            if next_cursor != 0:
+                # Continue with the next page, in this run or the next one
+                progress_log.record(index, id, "partial", cursor=next_cursor)
+                cursors[index] = next_cursor
+            else:
+                progress_log.record(index, id, "done")
+                n_explored += 1
+                chunk.pop(0)
 
-    # Save failed to file
-    pd.DataFrame(failed).to_csv(
-        f"{job_dir}{EDGELIST_FAILED_FNAME}", mode="a", header=False, index=False
-    )
+    # Requests actually sent, including user lookups and excluding pages served from the cache
+    n_sent = sum(counters["requests"] for counters in metrics.endpoints.values())
     print(
-        f"Sent {max_chunk_size - req_left} requests to explore {len(explored)+len(failed)} users. {len(failed)} users were excluded")
+        f"Sent {n_sent} requests to explore {n_explored + n_failed} users. {n_failed} users were excluded")
     print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tChunk processed")
-    return len(explored)
+    return n_explored + n_failed
 
 
-def move_next_chunk_start(job_dir, move_by):
+def main(job_num=None, max_chunk_size=14, friends_limit=15000):
     """
-    Move the start index of next chunk.
+    Process the next chunk of a job, by default the most recent one, as run by the crontab.
     """
-    fname = f"{job_dir}{NEXT_CHUNK_START_FNAME}"
-    with open(fname, "r") as f:
-        start = int(f.readline())
-    print(f"New chunk size: {start} + {move_by} = {start+move_by}")
-    with open(fname, "w") as f:
-        f.write(str(start + move_by))
-    return 0
+    api = get_twitter_api()
+    if job_num is None:
+        job_num = load_crontab_job_num()
+    job_dir = get_edgelist_job_dir_path(job_num)
+    # Replaying the log also recovers from an interrupted run
+    progress_log = ProgressLog(job_dir)
+    chunk = load_chunk(job_dir, progress_log, max_chunk_size=max_chunk_size)
+    prefetch_users(api, [id for _, id in chunk])
+    process_chunk(api, chunk, job_dir, progress_log, max_chunk_size=max_chunk_size, friends_limit=friends_limit)
+    return metrics.export("process_chunk", job_dirs=[job_dir])
+
 
+if __name__ == "__main__":
+    from twitnet import main as twitnet
 
-api = get_twitter_api()
-job_num = load_crontab_job_num()
-job_dir = get_edgelist_job_dir_path(job_num)
-chunk = load_chunk(job_dir, max_chunk_size=14)
-move_by = process_chunk(api, chunk, job_dir, friends_limit=15000)
-move_next_chunk_start(job_dir, move_by=move_by)
+    twitnet(["crawl", "--chunk", *sys.argv[1:]])
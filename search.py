@@ -1,65 +1,143 @@
+import csv
 import os
-from time import gmtime, strftime, strptime
-import pandas as pd
-from constants import FILES_FOLDER_NAME
+import sys
+from time import gmtime, strftime
+from constants import FILES_FOLDER_NAME, SEARCH_PAGE_SIZE
+from utils.metrics import metrics
+from utils.rate_limit import call_api
 from utils.twitter_auth import get_twitter_api
 
 
-def get_users_from_query(api, query, result_type="mixed", max_results=100, min_follower_count=500):
-    # Get tweets
-    try:
-        tweets = api.search_tweets(
-            q=query, result_type=result_type, count=max_results)
-        print(f"Number of tweets: {len(tweets)}")
-        if not tweets:
-            print("No tweets found")
-            return 1
-    except Exception as e:
-        print("Exception:", e)
-        print("Couldn't load tweets from the API")
-        return 1
+def get_tweet_row(twt):
+    """
+    Get the fields of a tweet saved to the tweet data files.
+    """
+    return [
+        twt["id_str"],
+        twt["user"]["id_str"],
+        twt["user"]["screen_name"],
+        twt["user"]["followers_count"],
+        twt["user"]["friends_count"],
+        twt["user"]["verified"],
+        twt["retweet_count"],
+        twt["favorite_count"],
+        twt["text"],
+    ]
+
 
-    tweet_data = []
-    for tweet in tweets:
-        twt = tweet._json
-        if (twt["user"]["followers_count"] >= min_follower_count):
-            tweet_data.append(
-                {
-                    "id_str": twt["id_str"],
-                    "user_id_str": twt["user"]["id_str"],
-                    "user_screen_name": twt["user"]["screen_name"],
-                    "user_followers_count": twt["user"]["followers_count"],
-                    "user_frieds_count": twt["user"]["friends_count"],
-                    "user_verified": twt["user"]["verified"],
-                    "retweet_count": twt["retweet_count"],
-                    "favorite_count": twt["favorite_count"],
-                    "text_snippet": twt["text"],
-                }
+def get_users_from_query(
+    api,
+    query,
+    result_type="mixed",
+    max_results=SEARCH_PAGE_SIZE,
+    min_follower_count=500,
+    target_users=None,
+    max_requests=1,
+    since_id=None,
+):
+    """
+    Find users who tweeted about a query, paging back through search results with max_id until `target_users` unique users
+    with at least `min_follower_count` followers are found, `max_requests` pages were requested, or results run out.
+    With `since_id`, only tweets newer than that tweet are searched (e.g. the newest tweet of a previous run).
+    Tweets are filtered and users deduplicated as pages arrive, and rows are appended to the output files page by page,
+    so only the IDs and follower counts of users found are kept in memory. Return the user IDs sorted by follower count,
+    or 1 if no tweets were found.
+    API reference(s): https://docs.tweepy.org/en/stable/api.html#tweepy.API.search_tweets
+    """
+    # One timestamp for all files of the run
+    stamp = f"{query.replace(' ', '_')}_{strftime('%Y_%m_%d__%H_%M_%S', gmtime())}"
+    files_dir = f"{os.path.abspath(os.getcwd())}{FILES_FOLDER_NAME}"
+    followers = {}
+    n_tweets = 0
+    n_requests = 0
+    max_id = None
+    newest_id = None
+    with open(f"{files_dir}full_tweet_data_{stamp}.csv", "w") as f_full, open(
+        f"{files_dir}tweet_data_{stamp}.csv", "w"
+    ) as f_users:
+        full_writer = csv.writer(f_full)
+        users_writer = csv.writer(f_users)
+        while (target_users is None or len(followers) < target_users) and (
+            max_requests is None or n_requests < max_requests
+        ):
+            try:
+                tweets = call_api(
+                    api,
+                    "search_tweets",
+                    q=query,
+                    result_type=result_type,
+                    count=max_results,
+                    max_id=max_id,
+                    since_id=since_id,
+                )
+            except Exception as e:
+                print("Exception:", e)
+                print("Couldn't load tweets from the API")
+                break
+            n_requests += 1
+            if not tweets:
+                break
+            for tweet in tweets:
+                if target_users is not None and len(followers) >= target_users:
+                    # Users beyond the target are left out, even if their tweets are on the page already fetched
+                    break
+                twt = tweet._json
+                if twt["user"]["followers_count"] < min_follower_count:
+                    continue
+                full_writer.writerow(get_tweet_row(twt))
+                if twt["user"]["id_str"] not in followers:
+                    followers[twt["user"]["id_str"]] = twt["user"]["followers_count"]
+                    users_writer.writerow(get_tweet_row(twt))
+            n_tweets += len(tweets)
+            oldest_id = min(tweet._json["id"] for tweet in tweets)
+            if newest_id is None:
+                newest_id = max(tweet._json["id"] for tweet in tweets)
+            # The next page holds tweets older than the oldest one of this page
+            max_id = oldest_id - 1
+            f_full.flush()
+            f_users.flush()
+            print(
+                f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tSearched {n_tweets} tweets, found {len(followers)} users"
             )
 
-    full_fname = f"{os.path.abspath(os.getcwd())}{FILES_FOLDER_NAME}full_tweet_data_{query.replace(' ', '_')}_{strftime('%Y_%m_%d__%H_%M_%S', gmtime())}.csv"
-    pd.DataFrame(tweet_data).to_csv(full_fname, header=False, index=False)
-    sorted_df = (
-        pd.DataFrame(tweet_data)
-        .sort_values(by="user_followers_count", ascending=False)
-        .drop_duplicates(subset="user_screen_name")
-    )
-    # Save user IDs
-    fname = f"{os.path.abspath(os.getcwd())}{FILES_FOLDER_NAME}{query.replace(' ', '_')}_{strftime('%Y_%m_%d__%H_%M_%S', gmtime())}.csv"
-    sorted_df["user_id_str"].to_csv(fname, header=False, index=False)
-    # Save tweet data
-    td_fname = f"{os.path.abspath(os.getcwd())}{FILES_FOLDER_NAME}tweet_data_{query.replace(' ', '_')}_{strftime('%Y_%m_%d__%H_%M_%S', gmtime())}.csv"
-    sorted_df.to_csv(td_fname, header=False, index=False)
+    print(f"Number of tweets: {n_tweets}")
+    if n_tweets == 0:
+        print("No tweets found")
+        return 1
+    # Save user IDs, most followed first
+    user_ids = sorted(followers, key=followers.get, reverse=True)
+    fname = f"{files_dir}{stamp}.csv"
+    with open(fname, "w") as f:
+        f.writelines(f"{id}\n" for id in user_ids)
 
     print(
-        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted {len(sorted_df)} users from search query"
+        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tExtracted {len(user_ids)} users from search query with {n_requests} requests"
     )
+    print(f"Newest tweet ID: {newest_id}. Pass it as --since-id to search only newer tweets next time")
     print(
         f"Now run load.py, choose route 'c', depth '0', and insert this filename:\n\n{fname}\n")
-    return sorted_df
+    return user_ids
+
+
+def main(query="", target_users=None, max_requests=1, min_follower_count=500, since_id=None):
+    """
+    Search users who tweeted about a query (prompting for it if not given) and save them for load.py.
+    """
+    api = get_twitter_api()
+    query = query or input("Provide a Twitter search query:\n")
+    get_users_from_query(
+        api,
+        query=query,
+        result_type="mixed",
+        min_follower_count=min_follower_count,
+        target_users=target_users,
+        max_requests=max_requests,
+        since_id=since_id,
+    )
+    return metrics.export("search")
+
 
+if __name__ == "__main__":
+    from twitnet import main as twitnet
 
-api = get_twitter_api()
-q = input("Provide a Twitter search query:\n")
-get_users_from_query(api, query=q, result_type="mixed",
-                     max_results=100)
+    twitnet(["search", *sys.argv[1:]])
@@ -0,0 +1,257 @@
+#!/usr/local/bin/python3
+"""
+Single entry point of the app: `python3 twitnet.py <command> [options]`, with the commands init, search, load, crawl,
+discover and analyze. Options left out are asked for, as in the scripts of each step.
+Each command imports its script only when it runs, so that short runs (e.g. crawl --chunk from the crontab)
+don't pay for pandas, NetworkX or matplotlib.
+"""
+import argparse
+import sys
+from constants import ASYNC_MAX_IN_FLIGHT, SEARCH_PAGE_SIZE
+
+
+def job_num_arg(value):
+    """
+    Parse a job number, where 'latest' is the most recent job.
+    """
+    if value == "latest":
+        from utils.job_load import get_latest_job_num
+
+        return get_latest_job_num()
+    return int(value)
+
+
+def run_init(args):
+    from initialize import main
+
+    return main(bearer_tokens=args.bearer_tokens)
+
+
+def run_search(args):
+    from search import main
+
+    return main(
+        query=args.query,
+        target_users=args.target_users,
+        max_requests=args.max_requests,
+        min_follower_count=args.min_follower_count,
+        since_id=args.since_id,
+    )
+
+
+def run_load(args):
+    from load import main
+
+    return main(
+        usernames=args.usernames,
+        usernames_file=args.usernames_file,
+        ids_file=args.ids_file,
+        concat_job_num=args.concat_job,
+        depth=args.depth,
+        level_cap=args.level_cap,
+        friends_limit=args.friends_limit,
+    )
+
+
+def run_crawl(args):
+    if args.chunk:
+        from process_chunk import main
+
+        return main(
+            job_num=args.job_nums[0] if args.job_nums else None,
+            max_chunk_size=args.chunk_size,
+            friends_limit=args.friends_limit,
+        )
+    from crawl import main
+
+    return main(
+        job_nums=args.job_nums,
+        schedule=args.schedule,
+        friends_limit=args.friends_limit,
+        use_async=args.use_async,
+        max_in_flight=args.max_in_flight,
+    )
+
+
+def run_discover(args):
+    from discover import main
+
+    return main(job_num=args.job, cutoff_perc=args.cutoff, method=args.method)
+
+
+def run_analyze(args):
+    from analyze import main
+
+    return main(
+        job_num=args.job,
+        filters=args.filter,
+        nodelist_mode=args.nodelist,
+        time_budget=args.time_budget,
+        backend=args.backend,
+    )
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="twitnet", description="Download and analyze follow networks on Twitter.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    init = subparsers.add_parser("init", help="create the app folders and save bearer tokens")
+    init.add_argument(
+        "--bearer-tokens",
+        nargs="*",
+        default=None,
+        help="Twitter bearer token(s); pass the flag without tokens to skip (default: prompt)",
+    )
+    init.set_defaults(func=run_init)
+
+    search = subparsers.add_parser("search", help="find users who tweeted about a query")
+    search.add_argument("query", nargs="?", default="", help="search query (default: prompt)")
+    search.add_argument(
+        "--target-users",
+        type=int,
+        default=None,
+        help="stop once this many unique users are found (default: no target)",
+    )
+    search.add_argument(
+        "--max-requests",
+        type=int,
+        default=1,
+        help=f"maximum number of search requests, of up to {SEARCH_PAGE_SIZE} tweets each (default: 1)",
+    )
+    search.add_argument(
+        "--min-follower-count",
+        type=int,
+        default=500,
+        help="skip users with fewer followers (default: 500)",
+    )
+    search.add_argument("--since-id", type=int, default=None, help="only search tweets newer than this tweet ID")
+    search.set_defaults(func=run_search)
+
+    load = subparsers.add_parser("load", help="create a job from users and expand it")
+    source = load.add_mutually_exclusive_group()
+    source.add_argument("--usernames", nargs="+", default=[], help="Twitter usernames")
+    source.add_argument("--usernames-file", default="", help="file of Twitter usernames, one per line")
+    source.add_argument("--ids-file", default="", help="file of Twitter IDs, one per line (e.g. from search)")
+    load.add_argument(
+        "--concat-job",
+        type=job_num_arg,
+        default=None,
+        help="number of a job whose edgelist to concatenate with the new job's (default: none; "
+        "asked for only when the source is picked at the prompt)",
+    )
+    load.add_argument(
+        "--depth",
+        type=int,
+        default=None,
+        help="levels of followed accounts to add to the ID set, 0 for the given users only (default: prompt)",
+    )
+    load.add_argument(
+        "--level-cap",
+        type=int,
+        default=None,
+        help="maximum number of IDs to add per level (default: no limit, or prompt along with the depth)",
+    )
+    load.add_argument(
+        "--friends-limit",
+        type=int,
+        default=15000,
+        help="don't expand from users who follow more accounts than this (default: 15000)",
+    )
+    load.set_defaults(func=run_load)
+
+    crawl = subparsers.add_parser("crawl", help="download the follows of a job's users")
+    crawl.add_argument(
+        "job_nums",
+        nargs="*",
+        type=job_num_arg,
+        help="numbers of the jobs to crawl (default: the most recent job)",
+    )
+    crawl.add_argument(
+        "--chunk",
+        action="store_true",
+        help="process one chunk of the given job (default: the most recent job) and exit, as run by the crontab",
+    )
+    crawl.add_argument(
+        "--chunk-size",
+        type=int,
+        default=14,
+        help="maximum number of friends/ids requests per chunk with --chunk (default: 14)",
+    )
+    crawl.add_argument(
+        "--schedule",
+        choices=["fair", "priority"],
+        default="fair",
+        help="'fair': jobs take turns, 'priority': jobs are finished in the given order (default: fair)",
+    )
+    crawl.add_argument(
+        "--friends-limit",
+        type=int,
+        default=15000,
+        help="exclude users who follow more accounts than this (default: 15000)",
+    )
+    crawl.add_argument("--async", dest="use_async", action="store_true", help="explore several users at once")
+    crawl.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=ASYNC_MAX_IN_FLIGHT,
+        help=f"maximum number of users explored at once with --async (default: {ASYNC_MAX_IN_FLIGHT})",
+    )
+    crawl.set_defaults(func=run_crawl)
+
+    discover = subparsers.add_parser("discover", help="find users followed by much of a community")
+    discover.add_argument("--job", type=job_num_arg, default=None, help="job number, or 'latest' (default: prompt)")
+    discover.add_argument(
+        "--cutoff",
+        type=float,
+        default=None,
+        help="share of a community that must follow a user, e.g. 0.5 (default: prompt)",
+    )
+    discover.add_argument(
+        "--method",
+        choices=["auto", "girvan_newman", "louvain", "label_propagation"],
+        default="auto",
+        help="community detection method (default: auto)",
+    )
+    discover.set_defaults(func=run_discover)
+
+    analyze = subparsers.add_parser("analyze", help="analyze and visualize a job's network")
+    analyze.add_argument("--job", type=job_num_arg, default=None, help="job number, or 'latest' (default: prompt)")
+    analyze.add_argument(
+        "--filter",
+        nargs="*",
+        choices=["outsiders", "original"],
+        default=None,
+        help="groups of nodes to filter out; pass the flag without groups to keep all nodes (default: prompt)",
+    )
+    analyze.add_argument(
+        "--nodelist",
+        choices=["new", "existing"],
+        default="",
+        help="make a new nodelist or use the existing one, if any (default: prompt)",
+    )
+    analyze.add_argument(
+        "--time-budget",
+        type=float,
+        default=None,
+        help="approximate metrics whose exact computation would take longer than this many seconds (default: all metrics exact)",
+    )
+    analyze.add_argument(
+        "--backend",
+        choices=["networkx", "sparse"],
+        default="networkx",
+        help="graph engine for the analysis; 'sparse' handles much larger networks (default: networkx)",
+    )
+    analyze.set_defaults(func=run_analyze)
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    if args.command == "crawl" and args.chunk and len(args.job_nums) > 1:
+        parser.error("crawl --chunk processes a single job")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+from time import time
+from constants import CACHE_EVICTION_TARGET, CACHE_FNAME, CACHE_MAX_ENTRIES, CACHE_TTL, CONFIG_FOLDER_NAME
+
+
+class Cache:
+    """
+    On-disk cache of API results in SQLite, keyed by endpoint and key (e.g. user ID).
+    Entries expire after the TTL of their endpoint, and the least recently used entries
+    are evicted once the cache holds more than `max_entries`. Safe to share between threads.
+    The number of entries is counted once, then tracked over writes as an upper bound (a replaced entry counts as new),
+    so writes don't scan the table. It's only counted again when the bound goes over the cap.
+    """
+
+    def __init__(self, path, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+        self.con = sqlite3.connect(path, check_same_thread=False)
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS cache (endpoint TEXT, key TEXT, value TEXT, fetched_at REAL, accessed_at REAL, PRIMARY KEY (endpoint, key))"
+        )
+        self.con.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)"
+        )
+        self.con.commit()
+        self.n_entries = self.con.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, endpoint, key):
+        """
+        Get a cached value, or None if it's missing or expired.
+        """
+        with self.lock:
+            row = self.con.execute(
+                "SELECT value, fetched_at FROM cache WHERE endpoint = ? AND key = ?",
+                (endpoint, str(key)),
+            ).fetchone()
+            if row is None:
+                return None
+            now = time()
+            if now - row[1] > self.ttl[endpoint]:
+                self.con.execute(
+                    "DELETE FROM cache WHERE endpoint = ? AND key = ?", (endpoint, str(key))
+                )
+                self.con.commit()
+                self.n_entries -= 1
+                return None
+            self.con.execute(
+                "UPDATE cache SET accessed_at = ? WHERE endpoint = ? AND key = ?",
+                (now, endpoint, str(key)),
+            )
+            self.con.commit()
+            return json.loads(row[0])
+
+    def get_many(self, endpoint, keys):
+        """
+        Get a dict of cached values for the keys that are present and not expired.
+        """
+        with self.lock:
+            keys = [str(key) for key in keys]
+            now = time()
+            found = {}
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                rows = self.con.execute(
+                    f"SELECT key, value FROM cache WHERE endpoint = ? AND fetched_at >= ? AND key IN ({','.join('?' * len(batch))})",
+                    [endpoint, now - self.ttl[endpoint]] + batch,
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                self.con.executemany(
+                    "UPDATE cache SET accessed_at = ? WHERE endpoint = ? AND key = ?",
+                    [(now, endpoint, key) for key in found],
+                )
+                self.con.commit()
+            return found
+
+    def put(self, endpoint, key, value):
+        """
+        Cache a JSON-serializable value.
+        """
+        return self.put_many(endpoint, {key: value})
+
+    def put_many(self, endpoint, values):
+        """
+        Cache a dict of JSON-serializable values, then evict entries over the size cap.
+        """
+        with self.lock:
+            now = time()
+            self.con.executemany(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                [(endpoint, str(key), json.dumps(value), now, now) for key, value in values.items()],
+            )
+            self.n_entries += len(values)
+            self.evict()
+            self.con.commit()
+            return 0
+
+    def evict(self):
+        """
+        Once the cache may hold more entries than the size cap, remove the least recently used ones
+        down to CACHE_EVICTION_TARGET of the cap.
+        """
+        if self.n_entries <= self.max_entries:
+            return 0
+        self.n_entries = self.con.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if self.n_entries > self.max_entries:
+            n_evicted = self.n_entries - int(self.max_entries * CACHE_EVICTION_TARGET)
+            self.con.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY accessed_at LIMIT ?)",
+                (n_evicted,),
+            )
+            self.n_entries -= n_evicted
+        return 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Get the cache shared by all API wrappers of the process, stored in the config folder.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config_path = f"{os.path.abspath(os.getcwd())}{CONFIG_FOLDER_NAME}"
+            if not os.path.exists(config_path):
+                os.mkdir(config_path)
+            _cache = Cache(f"{config_path}{CACHE_FNAME}")
+    return _cache
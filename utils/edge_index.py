@@ -0,0 +1,127 @@
+import io
+import json
+import os
+from time import gmtime, strftime
+import numpy as np
+import pandas as pd
+from constants import (
+    CONCAT_FNAME,
+    EDGE_INDEX_FNAME,
+    EDGE_INDEX_MANIFEST_FNAME,
+    EDGELIST_BIN_FNAME,
+    EDGELIST_FNAME,
+)
+from utils.edge_store import EDGE_DTYPE, EDGE_ID_SIZE
+
+
+def get_source_fnames(job_dir):
+    """
+    List the edgelist files merged into a job's edge index: those of the jobs listed in its concat file, then its own.
+    """
+    job_dirs = []
+    concat_fname = f"{job_dir}{CONCAT_FNAME}"
+    if os.path.exists(concat_fname):
+        with open(concat_fname, "r") as f:
+            job_dirs = [f"{os.path.dirname(i.strip())}/" for i in f.readlines() if i.strip()]
+    job_dirs.append(job_dir)
+    return [
+        fname
+        for d in dict.fromkeys(job_dirs)
+        for fname in (f"{d}{EDGELIST_BIN_FNAME}", f"{d}{EDGELIST_FNAME}")
+    ]
+
+
+def read_new_edges(fname, offset):
+    """
+    Read the edges appended to an edgelist file since byte `offset`. Return a tuple of (edges as an (n, 2) uint64 array,
+    new offset). Only complete records (or lines, for CSV files) are read.
+    """
+    size = os.path.getsize(fname)
+    if fname.endswith(EDGELIST_BIN_FNAME):
+        n_edges = (size - offset) // (2 * EDGE_ID_SIZE)
+        edges = np.fromfile(fname, dtype=EDGE_DTYPE, count=2 * n_edges, offset=offset)
+        return edges.reshape(-1, 2), offset + n_edges * 2 * EDGE_ID_SIZE
+    with open(fname, "rb") as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    data = data[: data.rfind(b"\n") + 1]
+    if not data.strip():
+        return np.empty((0, 2), dtype=EDGE_DTYPE), offset + len(data)
+    edges = pd.read_csv(io.BytesIO(data), names=["source", "target"], dtype=np.uint64)
+    return edges.to_numpy(dtype=EDGE_DTYPE), offset + len(data)
+
+
+def to_keys(edges):
+    """
+    View edges as 16-byte keys whose byte order matches the numeric (source, target) order, so they can be sorted and searched in one pass.
+    """
+    return np.ascontiguousarray(edges, dtype=">u8").view("V16").ravel()
+
+
+def from_keys(keys):
+    return keys.view(">u8").reshape(-1, 2).astype(EDGE_DTYPE)
+
+
+def merge_edges(index, edges):
+    """
+    Merge new edges into a sorted, deduplicated (n, 2) edge array. Work is O(k log k) for k new edges, plus a copy of the index.
+    """
+    new_keys = np.unique(to_keys(edges))
+    if index is None or len(index) == 0:
+        return from_keys(new_keys)
+    keys = to_keys(index)
+    pos = np.searchsorted(keys, new_keys)
+    present = keys[np.minimum(pos, len(keys) - 1)] == new_keys
+    return from_keys(np.insert(keys, pos[~present], new_keys[~present]))
+
+
+def update_edge_index(job_dir):
+    """
+    Bring a job's merged edge index up to date and return it memory-mapped as an (n, 2) uint64 array of unique edges,
+    sorted by source and target. The manifest records how many bytes of each source edgelist were merged, so only edges
+    appended since the last update are read. If a source shrank (e.g. uncommitted edges were truncated after a crash),
+    the index is rebuilt.
+    """
+    index_fname = f"{job_dir}{EDGE_INDEX_FNAME}"
+    manifest_fname = f"{job_dir}{EDGE_INDEX_MANIFEST_FNAME}"
+    offsets = {}
+    if os.path.exists(manifest_fname) and os.path.exists(index_fname):
+        with open(manifest_fname, "r") as f:
+            offsets = json.load(f)
+    fnames = [fname for fname in get_source_fnames(job_dir) if os.path.exists(fname)]
+    if any(os.path.getsize(fname) < offsets.get(fname, 0) for fname in fnames) or set(offsets) - set(fnames):
+        print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tEdgelist files changed, rebuilding edge index")
+        offsets = {}
+    index = read_edge_index(index_fname) if offsets else None
+
+    new_edges = []
+    for fname in fnames:
+        edges, offsets[fname] = read_new_edges(fname, offsets.get(fname, 0))
+        if len(edges):
+            new_edges.append(edges)
+
+    if new_edges or index is None:
+        n_before = 0 if index is None else len(index)
+        new_edges = np.concatenate(new_edges) if new_edges else np.empty((0, 2), dtype=EDGE_DTYPE)
+        merged = merge_edges(index, new_edges)
+        del index
+        # Replace the index atomically, then the manifest; a crash in between only causes a re-read of the new edges
+        merged.tofile(f"{index_fname}.tmp")
+        os.replace(f"{index_fname}.tmp", index_fname)
+        with open(f"{manifest_fname}.tmp", "w") as f:
+            json.dump(offsets, f)
+        os.replace(f"{manifest_fname}.tmp", manifest_fname)
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tMerged {len(new_edges)} new edges into edge index ({len(merged) - n_before} unique)"
+        )
+    return read_edge_index(index_fname)
+
+
+def read_edge_index(index_fname):
+    """
+    Memory-map an edge index as an (n, 2) uint64 array.
+    """
+    n_edges = os.path.getsize(index_fname) // (2 * EDGE_ID_SIZE)
+    if n_edges == 0:
+        return np.empty((0, 2), dtype=EDGE_DTYPE)
+    return np.memmap(index_fname, dtype=EDGE_DTYPE, mode="r", shape=(n_edges, 2))
@@ -0,0 +1,114 @@
+import os
+import struct
+from time import monotonic
+from constants import EDGE_FLUSH_SIZE, EDGELIST_BIN_FNAME, PROGRESS_COMMIT_INTERVAL, PROGRESS_COMMIT_STEPS
+from utils.metrics import metrics
+
+# Each edge is a (source, target) pair of little-endian uint64 IDs. They are packed with struct, so that the crawl
+# (and its cron-driven chunk runs) doesn't import NumPy; readers view them as NumPy arrays of EDGE_DTYPE
+EDGE_ID_FORMAT = "<Q"
+EDGE_ID_SIZE = struct.calcsize(EDGE_ID_FORMAT)
+EDGE_DTYPE = "<u8"
+
+
+class EdgeWriter:
+    """
+    Append-only writer of a job's binary edgelist. Edges are buffered and flushed to disk in chunks.
+    Use as a context manager, so that the remaining edges are flushed on exit.
+    With a ProgressLog, edges written after the last committed step (e.g. before a crash) are truncated first,
+    and buffered steps are committed right after their edges are flushed.
+    """
+
+    def __init__(
+        self,
+        job_dir,
+        flush_size=EDGE_FLUSH_SIZE,
+        progress_log=None,
+        commit_steps=PROGRESS_COMMIT_STEPS,
+        commit_interval=PROGRESS_COMMIT_INTERVAL,
+    ):
+        self.fname = f"{job_dir}{EDGELIST_BIN_FNAME}"
+        self.flush_size = flush_size
+        self.progress_log = progress_log
+        self.commit_steps = commit_steps
+        self.commit_interval = commit_interval
+        self.last_flush = monotonic()
+        self.buffer = []
+        self.n_buffered = 0
+        if progress_log is not None and count_edges(job_dir) > progress_log.n_edges:
+            os.truncate(self.fname, progress_log.n_edges * 2 * EDGE_ID_SIZE)
+        self.n_written = count_edges(job_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def write_edges(self, source, targets):
+        """
+        Buffer edges from one source to a list of targets (IDs as ints or strings).
+        """
+        if len(targets) == 0:
+            return 0
+        edges = [int(source)] * (2 * len(targets))
+        edges[1::2] = map(int, targets)
+        self.buffer.append(struct.pack(f"<{len(edges)}Q", *edges))
+        self.n_buffered += len(targets)
+        metrics.add_edges(len(targets))
+        if self.n_buffered >= self.flush_size:
+            self.flush()
+        return 0
+
+    def flush_if_due(self):
+        """
+        Flush, committing buffered steps of the progress log, once `commit_steps` steps are buffered or
+        `commit_interval` seconds passed since the last flush, so a crash in a long crawl loses little work.
+        """
+        if self.progress_log is None or not self.progress_log.pending:
+            return 0
+        if len(self.progress_log.pending) >= self.commit_steps or monotonic() - self.last_flush >= self.commit_interval:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """
+        Append buffered edges to the binary edgelist, then commit buffered steps of the progress log.
+        """
+        with metrics.timer("edge_write"):
+            if self.buffer:
+                with open(self.fname, "ab") as f:
+                    f.write(b"".join(self.buffer))
+                    if self.progress_log is not None:
+                        f.flush()
+                        os.fsync(f.fileno())
+                self.n_written += self.n_buffered
+                self.buffer = []
+                self.n_buffered = 0
+            if self.progress_log is not None:
+                self.progress_log.commit(self.n_written)
+        self.last_flush = monotonic()
+        return 0
+
+
+def count_edges(job_dir):
+    """
+    Count the edges in the binary edgelist of a job.
+    """
+    fname = f"{job_dir}{EDGELIST_BIN_FNAME}"
+    if not os.path.exists(fname):
+        return 0
+    return os.path.getsize(fname) // (2 * EDGE_ID_SIZE)
+
+
+def read_edges(job_dir):
+    """
+    Memory-map the binary edgelist of a job as an (n, 2) uint64 array, without copying it into memory.
+    Return None if the job has no binary edgelist.
+    """
+    import numpy as np
+
+    n_edges = count_edges(job_dir)
+    if n_edges == 0:
+        return None
+    return np.memmap(f"{job_dir}{EDGELIST_BIN_FNAME}", dtype=EDGE_DTYPE, mode="r", shape=(n_edges, 2))
@@ -0,0 +1,262 @@
+import json
+import math
+import threading
+from time import time
+import numpy as np
+import requests
+import tweepy
+from constants import RATE_LIMIT_WINDOW, RATE_LIMITS
+
+# Maximum number of IDs per friends/ids page, and of users per users/lookup request
+FRIENDS_PAGE_SIZE = 5000
+LOOKUP_MAX_USERS = 100
+SEARCH_MAX_COUNT = 100
+# Twitter IDs of synthetic users start here, so they can't be confused with row numbers
+FIRST_USER_ID = 1000000
+FIRST_TWEET_ID = 1600000000000000000
+
+REASONS = {401: "Unauthorized", 404: "Not Found", 429: "Too Many Requests"}
+
+
+class VirtualClock:
+    """
+    Clock whose sleeps return immediately and only move its time forward, so that rate-limit windows
+    and latency can be simulated without waiting. Pass it to FakeTwitterAPI and to the rate limiter.
+    """
+
+    def __init__(self, start=None):
+        self.now = time() if start is None else start
+        self.lock = threading.Lock()
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+
+class FakeModel:
+    """
+    Stand-in for tweepy models, which expose the raw API object as `_json`.
+    """
+
+    def __init__(self, data):
+        self._json = data
+
+
+def make_synthetic_graph(
+    n_users=20000,
+    n_communities=10,
+    mean_friends=40,
+    p_in_community=0.8,
+    n_heavy=5,
+    heavy_friends=12000,
+    seed=0,
+):
+    """
+    Generate a follow graph with community structure: each user follows `mean_friends` accounts on average (Poisson),
+    mostly within their own community and preferentially popular accounts. `n_heavy` users follow `heavy_friends`
+    accounts each, so that their friend lists span several pages. Return a dict of user ID to an array of friend IDs.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(FIRST_USER_ID, FIRST_USER_ID + n_users, dtype=np.int64)
+    community = rng.integers(0, n_communities, n_users)
+    members = [np.flatnonzero(community == c) for c in range(n_communities)]
+    # Heavy-tailed popularity, so that some accounts are followed by many
+    popularity = rng.pareto(1.5, n_users) + 1
+    n_friends = rng.poisson(mean_friends, n_users)
+    n_friends[rng.choice(n_users, size=min(n_heavy, n_users), replace=False)] = min(heavy_friends, n_users - 1)
+    friends = {}
+    for i in range(n_users):
+        n_in = rng.binomial(n_friends[i], p_in_community)
+        pool = members[community[i]]
+        weights = popularity[pool] / popularity[pool].sum()
+        inside = rng.choice(pool, size=min(n_in, len(pool)), replace=False, p=weights)
+        outside = rng.choice(n_users, size=n_friends[i] - len(inside), replace=False)
+        targets = np.unique(np.concatenate([inside, outside]))
+        friends[int(ids[i])] = ids[targets[targets != i]]
+    return friends
+
+
+class FakeTwitterAPI:
+    """
+    Offline stand-in for tweepy.API (v1.1), serving a synthetic follow graph (see make_synthetic_graph) with the
+    same methods and return values as the app uses: friend ID pages of 5000 with cursors, users/show, users/lookup
+    and search/tweets. Each endpoint has its own 15-minute rate-limit window, reported in `x-rate-limit-*` headers
+    and enforced with 429 errors. Protected users raise 401 Unauthorized, unknown and suspended users 404 Not Found.
+    Every request takes `latency` seconds on `clock`. Install it with utils.twitter_auth.set_twitter_api.
+    """
+
+    def __init__(
+        self,
+        friends,
+        clock=None,
+        latency=0.0,
+        protected=(),
+        suspended=(),
+        limits=RATE_LIMITS,
+        window=RATE_LIMIT_WINDOW,
+        tweets_per_user=2,
+        seed=0,
+    ):
+        self.friends = friends
+        self.clock = clock or VirtualClock()
+        self.latency = latency
+        self.protected = set(protected)
+        self.suspended = set(suspended)
+        self.limits = dict(limits)
+        self.window = window
+        self.windows = {}
+        self.n_requests = {}
+        # Each thread sees the response of its own last request, as with utils.twitter_auth.ThreadLocalApi
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        ids = np.fromiter(friends.keys(), dtype=np.int64, count=len(friends))
+        all_friends = np.concatenate([np.asarray(f, dtype=np.int64) for f in friends.values()] or [[]])
+        followed, counts = np.unique(all_friends, return_counts=True)
+        self.followers_count = dict(zip(followed.tolist(), counts.tolist()))
+        # Tweets from newest to oldest; tweet IDs grow with time, like snowflake IDs
+        rng = np.random.default_rng(seed)
+        n_tweets = tweets_per_user * len(ids)
+        self.tweet_users = rng.choice(ids, size=n_tweets) if len(ids) else ids
+        self.tweet_ids = FIRST_TWEET_ID + np.arange(n_tweets, 0, -1, dtype=np.int64)
+
+    @property
+    def last_response(self):
+        return getattr(self.local, "last_response", None)
+
+    @last_response.setter
+    def last_response(self, response):
+        self.local.last_response = response
+
+    def make_response(self, status_code, endpoint, errors=()):
+        """
+        Build a requests.Response with the rate-limit headers of an endpoint, like the ones tweepy receives.
+        """
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = REASONS.get(status_code, "OK")
+        state = self.windows[endpoint]
+        response.headers.update(
+            {
+                "x-rate-limit-limit": str(self.limits[endpoint]),
+                "x-rate-limit-remaining": str(max(self.limits[endpoint] - state["used"], 0)),
+                "x-rate-limit-reset": str(math.ceil(state["reset"])),
+            }
+        )
+        response._content = json.dumps({"errors": list(errors)}).encode()
+        return response
+
+    def request(self, endpoint):
+        """
+        Count a request against the endpoint's window, raising 429 if the window's quota is spent.
+        """
+        with self.lock:
+            now = self.clock.time()
+            state = self.windows.get(endpoint)
+            if state is None or now >= state["reset"]:
+                state = {"used": 0, "reset": now + self.window}
+                self.windows[endpoint] = state
+            self.n_requests[endpoint] = self.n_requests.get(endpoint, 0) + 1
+            if state["used"] >= self.limits[endpoint]:
+                response = self.make_response(429, endpoint, [{"code": 88, "message": "Rate limit exceeded"}])
+                self.last_response = response
+                raise tweepy.errors.TooManyRequests(response)
+            state["used"] += 1
+        self.clock.sleep(self.latency)
+        self.last_response = self.make_response(200, endpoint)
+        return 0
+
+    def raise_error(self, status_code, endpoint, code, message):
+        response = self.make_response(status_code, endpoint, [{"code": code, "message": message}])
+        self.last_response = response
+        if status_code == 401:
+            raise tweepy.errors.Unauthorized(response)
+        raise tweepy.errors.NotFound(response)
+
+    def get_user_json(self, user_id):
+        """
+        Build the user object of a synthetic user, or return None if it doesn't exist or is suspended.
+        """
+        if user_id not in self.friends or user_id in self.suspended:
+            return None
+        return {
+            "id": user_id,
+            "id_str": str(user_id),
+            "name": f"User {user_id}",
+            "screen_name": f"user{user_id}",
+            "followers_count": self.followers_count.get(user_id, 0),
+            "friends_count": len(self.friends[user_id]),
+            "verified": False,
+            "protected": user_id in self.protected,
+        }
+
+    def get_user_id(self, user_id=None, screen_name=None):
+        if user_id is not None:
+            return int(user_id)
+        return int(str(screen_name).lower().replace("user", "", 1) or 0)
+
+    def get_friend_ids(self, user_id=None, screen_name=None, cursor=-1, stringify_ids=False, **kwargs):
+        self.request("friends/ids")
+        user_id = self.get_user_id(user_id, screen_name)
+        if self.get_user_json(user_id) is None:
+            self.raise_error(404, "friends/ids", 50, "User not found.")
+        if user_id in self.protected:
+            self.raise_error(401, "friends/ids", 220, "Your credentials do not allow access to this resource.")
+        # Cursor n (n > 0) points to the n-th page
+        page = 0 if cursor == -1 else cursor
+        friend_ids = self.friends[user_id][page * FRIENDS_PAGE_SIZE : (page + 1) * FRIENDS_PAGE_SIZE]
+        next_cursor = page + 1 if (page + 1) * FRIENDS_PAGE_SIZE < len(self.friends[user_id]) else 0
+        previous_cursor = -page if page > 0 else 0
+        friend_ids = [str(i) for i in friend_ids] if stringify_ids else friend_ids.tolist()
+        return friend_ids, (previous_cursor, next_cursor)
+
+    def get_user(self, user_id=None, screen_name=None, **kwargs):
+        self.request("users/show")
+        user = self.get_user_json(self.get_user_id(user_id, screen_name))
+        if user is None:
+            self.raise_error(404, "users/show", 50, "User not found.")
+        return FakeModel(user)
+
+    def lookup_users(self, user_id=None, screen_name=None, **kwargs):
+        self.request("users/lookup")
+        keys = (user_id if user_id is not None else screen_name)[:LOOKUP_MAX_USERS]
+        users = [
+            self.get_user_json(self.get_user_id(user_id=key) if user_id is not None else self.get_user_id(screen_name=key))
+            for key in keys
+        ]
+        users = [FakeModel(user) for user in users if user is not None]
+        if not users:
+            self.raise_error(404, "users/lookup", 17, "No user matches for specified terms.")
+        return users
+
+    def search_tweets(self, q, count=15, max_id=None, since_id=None, **kwargs):
+        """
+        Return up to `count` tweets, newest first. Every synthetic tweet matches any query, except those of
+        suspended users, which search doesn't return.
+        """
+        self.request("search/tweets")
+        mask = ~np.isin(self.tweet_users, np.fromiter(self.suspended, dtype=np.int64, count=len(self.suspended)))
+        if max_id is not None:
+            mask &= self.tweet_ids <= int(max_id)
+        if since_id is not None:
+            mask &= self.tweet_ids > int(since_id)
+        index = np.flatnonzero(mask)[: min(count, SEARCH_MAX_COUNT)]
+        return [
+            FakeModel(
+                {
+                    "id": int(self.tweet_ids[i]),
+                    "id_str": str(self.tweet_ids[i]),
+                    "user": self.get_user_json(int(self.tweet_users[i])),
+                    "retweet_count": 0,
+                    "favorite_count": 0,
+                    "text": f"Synthetic tweet about {q}",
+                }
+            )
+            for i in index
+        ]
+
+    def verify_credentials(self, **kwargs):
+        return True
@@ -0,0 +1,112 @@
+from time import gmtime, strftime
+from constants import USERS_LOOKUP_BATCH_SIZE
+from utils.cache import get_cache
+from utils.rate_limit import call_api
+
+
+def get_friend_ids(api, user_id, cursor=-1):
+    """
+    Get one page of IDs of accounts followed by a user, from the cache or from the friends/ids endpoint.
+    Return a tuple of (friend IDs as strings, (previous cursor, next cursor)), like tweepy.API.get_friend_ids.
+    """
+    cache = get_cache()
+    key = f"{user_id}:{cursor}"
+    cached = cache.get("friends/ids", key)
+    if cached is not None:
+        return cached[0], tuple(cached[1])
+    res = call_api(api, "get_friend_ids", user_id=user_id, stringify_ids=True, cursor=cursor)
+    friend_ids, cursors = list(res[0]), tuple(res[1])
+    cache.put("friends/ids", key, [friend_ids, cursors])
+    return friend_ids, cursors
+
+
+def get_all_friend_ids(api, user_id):
+    """
+    Get the IDs of all accounts followed by a user, paging through friends/ids until the last cursor.
+    """
+    friend_ids = []
+    cursor = -1
+    while cursor != 0:
+        page, (_, cursor) = get_friend_ids(api, user_id, cursor=cursor)
+        friend_ids.extend(page)
+    return friend_ids
+
+
+def cache_users(users):
+    """
+    Cache user dicts by ID and by screen name.
+    """
+    cache = get_cache()
+    cache.put_many("users", {user["id_str"]: user for user in users})
+    cache.put_many(
+        "users_by_screen_name", {user["screen_name"].lower(): user for user in users}
+    )
+    return 0
+
+
+def get_user(api, user_id):
+    """
+    Get a user dict from the cache or from the users/show endpoint.
+    """
+    user = get_cache().get("users", user_id)
+    if user is None:
+        user = call_api(api, "get_user", user_id=user_id)._json
+        cache_users([user])
+    return user
+
+
+def lookup_users(api, user_ids=None, screen_names=None, batch_size=USERS_LOOKUP_BATCH_SIZE):
+    """
+    Look up users by ID or by screen name. Cached users are returned first, the rest are
+    requested up to 100 per users/lookup request. Yield a tuple of (user dicts, IDs or screen
+    names not returned by the API) for each batch.
+    API reference(s): https://docs.tweepy.org/en/stable/api.html#tweepy.API.lookup_users
+    """
+    cache = get_cache()
+    by_id = user_ids is not None
+    endpoint = "users" if by_id else "users_by_screen_name"
+    keys = list(
+        dict.fromkeys(str(i) if by_id else str(i).lower() for i in (user_ids if by_id else screen_names))
+    )
+
+    # Serve cached users without spending quota
+    found = cache.get_many(endpoint, keys)
+    cached = list(found.values())
+    missing = [key for key in keys if key not in found]
+    if cached:
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLoaded {len(cached)} of {len(keys)} users from cache"
+        )
+        yield cached, []
+
+    for i in range(0, len(missing), batch_size):
+        batch = missing[i : i + batch_size]
+        try:
+            if by_id:
+                res = call_api(api, "lookup_users", user_id=batch)
+            else:
+                res = call_api(api, "lookup_users", screen_name=batch)
+            users = [user._json for user in res]
+        except Exception as e:
+            # All users of the batch are missing (e.g. suspended) or the request failed
+            print("Exception:", repr(str(e)))
+            users = []
+        cache_users(users)
+        if by_id:
+            found = set(user["id_str"] for user in users)
+        else:
+            found = set(user["screen_name"].lower() for user in users)
+        failed = [key for key in batch if key not in found]
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tLooked up {len(users)} of {len(batch)} users"
+        )
+        yield users, failed
+
+
+def prefetch_users(api, user_ids):
+    """
+    Look up users up to 100 per request and cache them, so that later get_user calls for them cost no request.
+    """
+    for _ in lookup_users(api, user_ids=user_ids):
+        pass
+    return 0
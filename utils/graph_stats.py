@@ -0,0 +1,84 @@
+import math
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+
+def estimate_diameter_cost(n_nodes, n_edges):
+    """
+    Estimate the number of operations needed for the exact diameter (a BFS from every node).
+    """
+    return n_nodes * (n_nodes + n_edges)
+
+
+def estimate_transitivity_cost(G):
+    """
+    Estimate the number of operations needed for the exact transitivity (intersecting neighbor sets of every wedge).
+    G can be a NetworkX graph or a SparseGraph, whose out-degrees are a Series.
+    """
+    out_degree = G.out_degree()
+    if isinstance(out_degree, pd.Series):
+        out_degree = out_degree.to_numpy(dtype=np.float64)
+    else:
+        out_degree = np.fromiter((d for _, d in out_degree), dtype=np.float64)
+    return (out_degree * out_degree).sum()
+
+
+def approximate_diameter(G, n_sweeps=4, seed=0):
+    """
+    Bound the diameter of a strongly connected directed graph G with repeated double sweeps.
+    Each sweep runs a BFS from a node to its farthest node, whose eccentricity is a lower bound.
+    For any node r, the out-eccentricity plus the in-eccentricity of r is an upper bound.
+    Return a tuple of (lower bound, upper bound).
+    """
+    rng = np.random.default_rng(seed)
+    nodes = list(G.nodes())
+    G_reversed = G.reverse(copy=False)
+    lower = 0
+    upper = math.inf
+    start = nodes[rng.integers(len(nodes))]
+    for _ in range(n_sweeps):
+        # Forward sweep from start, then from the farthest node found
+        dist = nx.single_source_shortest_path_length(G, start)
+        farthest = max(dist, key=dist.get)
+        dist_in = nx.single_source_shortest_path_length(G_reversed, start)
+        upper = min(upper, dist[farthest] + max(dist_in.values()))
+        lower = max(lower, dist[farthest], max(dist_in.values()))
+        dist_farthest = nx.single_source_shortest_path_length(G, farthest)
+        lower = max(lower, max(dist_farthest.values()))
+        if lower == upper:
+            break
+        # Continue from the node farthest from the last sweep
+        start = max(dist_farthest, key=dist_farthest.get)
+    return lower, upper
+
+
+def sample_transitivity(G, n_samples=10000, seed=0):
+    """
+    Estimate the transitivity of G by sampling wedges (ordered pairs of distinct successors of a node),
+    with the same definition as nx.transitivity. A wedge (v, w, x) is closed if x is a successor of w.
+    Return a tuple of (estimate, half-width of its 95% confidence interval).
+    """
+    rng = np.random.default_rng(seed)
+    nodes = []
+    weights = []
+    for v, succ in G.adjacency():
+        d = len(succ) - (v in succ)
+        if d > 1:
+            nodes.append(v)
+            weights.append(d * (d - 1))
+    if not nodes:
+        return 0.0, 0.0
+    weights = np.array(weights, dtype=np.float64)
+    centers = rng.choice(len(nodes), size=n_samples, p=weights / weights.sum())
+    closed = 0
+    succ_lists = {}
+    for i in centers:
+        if i not in succ_lists:
+            succ_lists[i] = [w for w in G._adj[nodes[i]] if w != nodes[i]]
+        succ = succ_lists[i]
+        w, x = rng.choice(len(succ), size=2, replace=False)
+        if succ[x] in G._adj[succ[w]]:
+            closed += 1
+    p = closed / n_samples
+    return p, 1.96 * math.sqrt(p * (1 - p) / n_samples)
@@ -0,0 +1,63 @@
+import os
+import struct
+from time import gmtime, strftime
+from constants import TWITTER_IDS_BIN_FNAME, TWITTER_IDS_FNAME
+
+# Each ID is a little-endian uint64 record, so the i-th ID starts at byte 8 * i. Chunks are read with struct, so that
+# the cron-driven chunk runs don't import NumPy, which is only imported to migrate and insert IDs
+ID_FORMAT = "<Q"
+ID_SIZE = struct.calcsize(ID_FORMAT)
+ID_DTYPE = "<u8"
+
+
+class IdStore:
+    """
+    List of Twitter IDs to explore in a job, stored as fixed-width records in twitter_ids.bin.
+    Chunks are read with a seek, the count comes from the file size, and IDs already in the store are skipped on insert.
+    A job created with an older version of the app is migrated from its twitter_ids.csv, keeping the order of IDs
+    (and any duplicates) so that indices recorded in its progress stay valid.
+    """
+
+    def __init__(self, job_dir):
+        self.fname = f"{job_dir}{TWITTER_IDS_BIN_FNAME}"
+        csv_fname = f"{job_dir}{TWITTER_IDS_FNAME}"
+        if not os.path.exists(self.fname) and os.path.exists(csv_fname):
+            import numpy as np
+
+            ids = np.loadtxt(csv_fname, dtype=ID_DTYPE, ndmin=1)
+            ids.tofile(self.fname)
+            print(
+                f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tMigrated {len(ids)} IDs from {TWITTER_IDS_FNAME}"
+            )
+
+    def __len__(self):
+        if not os.path.exists(self.fname):
+            return 0
+        return os.path.getsize(self.fname) // ID_SIZE
+
+    def read(self, start=0, stop=None):
+        """
+        Read the IDs from index `start` to `stop` (exclusive, default: the end) as strings.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        with open(self.fname, "rb") as f:
+            f.seek(start * ID_SIZE)
+            data = f.read((stop - start) * ID_SIZE)
+        return [str(id) for id in struct.unpack(f"<{len(data) // ID_SIZE}Q", data)]
+
+    def add(self, ids):
+        """
+        Append IDs that are not in the store yet, in their order of first appearance. Return the number of IDs added.
+        """
+        import numpy as np
+
+        ids = np.asarray(list(ids), dtype=ID_DTYPE)
+        _, first = np.unique(ids, return_index=True)
+        ids = ids[np.sort(first)]
+        if len(self) > 0:
+            ids = ids[~np.isin(ids, np.fromfile(self.fname, dtype=ID_DTYPE))]
+        with open(self.fname, "ab") as f:
+            ids.tofile(f)
+        return len(ids)
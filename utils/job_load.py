@@ -1,7 +1,7 @@
 import os
 from time import gmtime, strftime
-import pandas as pd
-from constants import CONCAT_FNAME, EDGELIST_FAILED_FNAME, EDGELIST_FNAME, EDGELIST_JOBS_FOLDER_NAME, NEXT_EDGELIST_JOB_FNAME
+from constants import EDGELIST_FAILED_FNAME, EDGELIST_JOBS_FOLDER_NAME, NEXT_EDGELIST_JOB_FNAME
+from utils.metrics import metrics
 
 
 def get_job_num():
@@ -12,17 +12,24 @@ def get_job_num():
         "Specify job number. For the most recent crontab job, click Enter\nEnter job number or click Enter: "
     )
     if not job_num:
-        with open(f"{os.path.abspath(os.getcwd())}{EDGELIST_JOBS_FOLDER_NAME}{NEXT_EDGELIST_JOB_FNAME}", "r") as f:
-            job_num = int(f.readline()) - 1
+        job_num = get_latest_job_num()
     else:
         try:
             job_num = int(job_num)
         except:
-            get_job_num()
+            return get_job_num()
     print(f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tSelected job {job_num}")
     return job_num
 
 
+def get_latest_job_num():
+    """
+    Get the number of the most recently created job.
+    """
+    with open(f"{os.path.abspath(os.getcwd())}{EDGELIST_JOBS_FOLDER_NAME}{NEXT_EDGELIST_JOB_FNAME}", "r") as f:
+        return int(f.readline()) - 1
+
+
 def get_edgelist_job_dir_path(job_num):
     """
     Get the full path of a job dir based on its number.
@@ -30,36 +37,20 @@ def get_edgelist_job_dir_path(job_num):
     return f"{os.path.abspath(os.getcwd())}{EDGELIST_JOBS_FOLDER_NAME}{job_num}/"
 
 
+@metrics.timed("edgelist_load")
 def load_edgelist(job_dir):
     """
-    Load edgelist from specified job dir.
+    Load edgelist from specified job dir, including edgelists of jobs listed in its concat file.
+    Edges come from the job's merged edge index, so they are unique, and only edges added since the last load are parsed.
+    IDs are returned as int64.
     """
+    # Imported here, so that scripts that only need job paths start faster
+    import numpy as np
+    import pandas as pd
+    from utils.edge_index import update_edge_index
 
-    # Load edgelists from other jobs based on concat file
-    concat_fname = f"{job_dir}{CONCAT_FNAME}"
-    dfs = []
-    if os.path.exists(concat_fname):
-        with open(concat_fname, "r") as f:
-            dfs = [pd.read_csv(i.strip(), names=["source", "target"], dtype={
-                            "source": str, "target": str}) for i in f.readlines()]
-    try:
-        # Load edgelist from current job
-        df_og = pd.read_csv(
-            f"{job_dir}{EDGELIST_FNAME}",
-            names=["source", "target"],
-            dtype={"source": str, "target": str},
-        )
-        dfs.append(df_og)
-    except FileNotFoundError:
-        pass
-    df = pd.concat(dfs)
-
-    # df = pd.read_csv(
-    #     f"{job_dir}{EDGELIST_FNAME}",
-    #     names=["source", "target"],
-    #     dtype={"source": str, "target": str},
-    # )
-    return df
+    edges = update_edge_index(job_dir)
+    return pd.DataFrame(edges.view(np.int64), columns=["source", "target"], copy=False)
 
 
 def load_failed(job_dir):
@@ -0,0 +1,190 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import LinearOperator, eigsh
+
+# Number of grid cells per axis used to approximate repulsion between distant nodes
+REPULSION_GRID_SIZE = 16
+# Number of subcells per axis of each grid cell, used to approximate repulsion between nodes of the same cell
+REPULSION_SUBGRID_SIZE = 8
+# Most node-cell pairs handled at once when computing repulsion from grid cells
+REPULSION_BATCH_SIZE = 2**16
+# Number of edges hashed at once for the layout cache key
+EDGE_HASH_BATCH_SIZE = 2**16
+
+
+def spectral_layout(adjacency, seed=0):
+    """
+    Compute initial 2D positions from the leading non-trivial eigenvectors of the regularized, normalized
+    adjacency matrix of the undirected graph. Regularization keeps disconnected graphs well-conditioned.
+    """
+    n_nodes = adjacency.shape[0]
+    if n_nodes < 4:
+        return np.random.default_rng(seed).random((n_nodes, 2))
+    undirected = ((adjacency + adjacency.T) > 0).astype(np.float64)
+    degree = np.asarray(undirected.sum(axis=1)).ravel()
+    tau = degree.mean()
+    scale = 1 / np.sqrt(degree + tau)
+
+    def matvec(x):
+        x = np.asarray(x).reshape(n_nodes, -1) * scale[:, None]
+        y = undirected @ x + tau / n_nodes * x.sum(axis=0, keepdims=True)
+        return y * scale[:, None]
+
+    operator = LinearOperator((n_nodes, n_nodes), matvec=matvec, matmat=matvec, dtype=np.float64)
+    v0 = np.random.default_rng(seed).random(n_nodes)
+    _, vectors = eigsh(operator, k=3, which="LA", v0=v0)
+    # Drop the eigenvector of the largest eigenvalue, which only reflects degrees
+    pos = vectors[:, :2]
+    return pos / np.abs(pos).max(axis=0).clip(min=1e-12)
+
+
+def get_cell_repulsion(pos, center, mass, k):
+    """
+    Get the repulsion on each node from the centers of mass of cells: k^2 / d per node in the cell, towards the node.
+    `center` and `mass` are given per cell, as (n_cells, 2) and (n_cells,) arrays shared by all nodes, or per node,
+    as (n, n_cells, 2) and (n, n_cells) arrays.
+    """
+    dx = pos[:, 0, None] - center[..., 0]
+    dy = pos[:, 1, None] - center[..., 1]
+    weight = dx * dx + dy * dy
+    np.maximum(weight, k * k * 0.01, out=weight)
+    np.divide(mass, weight, out=weight)
+    if center.ndim == 2:
+        weighted_center = weight @ center
+    else:
+        weighted_center = np.einsum("ij,ijk->ik", weight, center)
+    return k * k * (pos * weight.sum(axis=1)[:, None] - weighted_center)
+
+
+def get_grid_repulsion(pos, k):
+    """
+    Approximate the repulsion between all nodes on two grids, in linear time: each node is repelled by the centers
+    of mass of the other cells of a coarse grid, by those of the other subcells of its own cell, and by the center of mass
+    of the other nodes of its own subcell, so that dense communities don't collapse onto a point.
+    """
+    n_nodes = len(pos)
+    size = REPULSION_GRID_SIZE * REPULSION_SUBGRID_SIZE
+    low, high = pos.min(axis=0), pos.max(axis=0)
+    fine = ((pos - low) / (high - low).clip(min=1e-9) * (size - 1e-9)).astype(np.int64)
+    coarse = fine // REPULSION_SUBGRID_SIZE
+    cell_id = coarse[:, 0] * REPULSION_GRID_SIZE + coarse[:, 1]
+    subcell_id = fine[:, 0] * size + fine[:, 1]
+
+    def get_centers(ids, n_cells):
+        mass = np.bincount(ids, minlength=n_cells).astype(np.float64)
+        center = np.stack(
+            [np.bincount(ids, weights=pos[:, i], minlength=n_cells) for i in range(2)], axis=1
+        ) / mass.clip(min=1)[:, None]
+        return center, mass
+
+    center, mass = get_centers(cell_id, REPULSION_GRID_SIZE * REPULSION_GRID_SIZE)
+    sub_center, sub_mass = get_centers(subcell_id, size * size)
+    occupied = np.flatnonzero(mass)
+    # IDs of the subcells of each node's cell
+    offsets = (np.arange(REPULSION_SUBGRID_SIZE)[:, None] * size + np.arange(REPULSION_SUBGRID_SIZE)[None, :]).ravel()
+    first_subcell = coarse[:, 0] * REPULSION_SUBGRID_SIZE * size + coarse[:, 1] * REPULSION_SUBGRID_SIZE
+    repulsion = np.zeros_like(pos)
+    batch_size = max(1, REPULSION_BATCH_SIZE // max(len(occupied), len(offsets)))
+    for start in range(0, n_nodes, batch_size):
+        batch = slice(start, start + batch_size)
+        # All cells of the grid, then all subcells of the node's cell
+        repulsion[batch] += get_cell_repulsion(pos[batch], center[occupied], mass[occupied], k)
+        subcells = first_subcell[batch, None] + offsets[None, :]
+        repulsion[batch] += get_cell_repulsion(pos[batch], sub_center[subcells], sub_mass[subcells], k)
+        # Take out the node's own cell from the first sum and its own subcell from the second one
+        own_cell, own_subcell = cell_id[batch, None], subcell_id[batch, None]
+        repulsion[batch] -= get_cell_repulsion(pos[batch], center[own_cell], mass[own_cell], k)
+        repulsion[batch] -= get_cell_repulsion(pos[batch], sub_center[own_subcell], sub_mass[own_subcell], k)
+        # Other nodes of the node's subcell, from their center of mass
+        n_others = sub_mass[own_subcell] - 1
+        others_total = sub_center[own_subcell] * sub_mass[own_subcell, None] - pos[batch, None, :]
+        others_center = others_total / n_others.clip(min=1)[:, :, None]
+        repulsion[batch] += get_cell_repulsion(pos[batch], others_center, n_others, k)
+    return repulsion
+
+
+def force_layout(adjacency, pos, iterations=50, seed=0):
+    """
+    Refine positions with a force-directed layout in O(n + m) per iteration: attraction along edges, and repulsion
+    approximated on a grid with subdivided cells (see get_grid_repulsion) instead of computed between every pair of nodes.
+    """
+    rng = np.random.default_rng(seed)
+    n_nodes = adjacency.shape[0]
+    undirected = ((adjacency + adjacency.T) > 0).astype(np.float64).tocoo()
+    rows, cols = undirected.row, undirected.col
+    k = 1 / np.sqrt(n_nodes)
+    pos = pos + rng.normal(scale=k * 0.01, size=pos.shape)
+    temperature = 0.1
+    for _ in range(iterations):
+        # Attraction along edges: d^2 / k, directed towards the neighbor
+        delta = pos[cols] - pos[rows]
+        distance = np.linalg.norm(delta, axis=1).clip(min=1e-9)
+        attraction = delta * (distance / k)[:, None]
+        displacement = np.stack(
+            [np.bincount(rows, weights=attraction[:, i], minlength=n_nodes) for i in range(2)], axis=1
+        )
+        displacement += get_grid_repulsion(pos, k)
+
+        # Move nodes, limited by the temperature
+        length = np.linalg.norm(displacement, axis=1).clip(min=1e-9)
+        pos = pos + displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= 0.95
+    return pos
+
+
+def large_graph_layout(adjacency, iterations=50, seed=0):
+    """
+    Lay out a large graph given as a sparse adjacency matrix: sparse spectral initialization, then force-directed refinement.
+    """
+    adjacency = sp.csr_matrix(adjacency)
+    pos = spectral_layout(adjacency, seed=seed)
+    return force_layout(adjacency, pos, iterations=iterations, seed=seed)
+
+
+def get_edge_hash(nodes, adjacency):
+    """
+    Hash the edges of a graph as pairs of node IDs (integers), independently of the order of nodes and edges: each edge
+    is mixed into 64 bits and the results are summed. Edges are hashed in batches, so memory doesn't grow with their number.
+    """
+    adjacency = sp.csr_matrix(adjacency)
+    nodes = np.asarray(nodes).astype(np.uint64)
+    total = 0
+    for start in range(0, adjacency.nnz, EDGE_HASH_BATCH_SIZE):
+        index = np.arange(start, min(start + EDGE_HASH_BATCH_SIZE, adjacency.nnz))
+        sources = nodes[np.searchsorted(adjacency.indptr, index, side="right") - 1]
+        targets = nodes[adjacency.indices[index]]
+        # splitmix64 finalizer
+        z = sources * np.uint64(0x9E3779B97F4A7C15) + targets
+        z ^= z >> np.uint64(30)
+        z *= np.uint64(0xBF58476D1CE4E5B9)
+        z ^= z >> np.uint64(27)
+        z *= np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+        total = (total + int(z.sum(dtype=np.uint64))) % 2**64
+    return f"{adjacency.nnz}:{total:016x}"
+
+
+def load_cached_layout(fname, nodes, adjacency):
+    """
+    Load cached positions, if they were computed for exactly the same nodes and edges. Return None otherwise.
+    """
+    if not os.path.exists(fname):
+        return None
+    cached = np.load(fname)
+    if len(cached["nodes"]) != len(nodes) or not np.array_equal(np.sort(cached["nodes"]), np.sort(nodes)):
+        return None
+    if "edge_hash" not in cached or str(cached["edge_hash"]) != get_edge_hash(nodes, adjacency):
+        return None
+    # Reorder cached positions to match the order of `nodes`
+    order = np.argsort(cached["nodes"])
+    return cached["pos"][order][np.argsort(np.argsort(nodes))]
+
+
+def save_cached_layout(fname, nodes, adjacency, pos):
+    """
+    Cache positions of nodes, with a hash of the edges they were computed for, so the figure can be re-rendered
+    without running the layout again.
+    """
+    np.savez(fname, nodes=nodes, pos=pos, edge_hash=get_edge_hash(nodes, adjacency))
+    return 0
@@ -0,0 +1,176 @@
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import gmtime, perf_counter, strftime, time
+from constants import FILES_FOLDER_NAME, METRICS_LOG_FNAME, PROMETHEUS_FNAME_PREFIX
+
+
+class Metrics:
+    """
+    Counters and timers of one run of a script: seconds spent in each stage, requests, retries and errors per endpoint,
+    seconds waited for rate limits per endpoint, and edges collected. Safe to share between threads.
+    Timings of a stage add up over all its calls (and over threads, so they can exceed the run's wall-clock time).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time()
+        self.stages = {}
+        self.endpoints = {}
+        self.n_edges = 0
+
+    def add_stage_time(self, stage, seconds):
+        with self.lock:
+            totals = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            totals["seconds"] += seconds
+            totals["calls"] += 1
+        return 0
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Time a block of code as one call of a stage, e.g. `with metrics.timer("graph_build"):`.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, perf_counter() - start)
+
+    def timed(self, stage):
+        """
+        Decorator timing every call of a function as one call of a stage.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count(self, endpoint, name, n=1):
+        """
+        Add to a counter of an endpoint: 'requests', 'retries', 'errors' or 'rate_limit_wait_seconds'.
+        """
+        with self.lock:
+            counters = self.endpoints.setdefault(
+                endpoint, {"requests": 0, "retries": 0, "errors": 0, "rate_limit_wait_seconds": 0.0}
+            )
+            counters[name] += n
+        return 0
+
+    def add_edges(self, n):
+        with self.lock:
+            self.n_edges += n
+        return 0
+
+    def get_edges_per_request(self):
+        """
+        Get the number of edges collected per friends/ids request, or None if none was sent.
+        """
+        n_requests = self.endpoints.get("friends/ids", {}).get("requests", 0)
+        return self.n_edges / n_requests if n_requests else None
+
+    def to_dict(self, script):
+        with self.lock:
+            return {
+                "timestamp": strftime("%Y-%m-%d %H:%M:%S", gmtime()),
+                "script": script,
+                "duration_seconds": round(time() - self.started_at, 3),
+                "stages": {
+                    stage: {"seconds": round(totals["seconds"], 3), "calls": totals["calls"]}
+                    for stage, totals in self.stages.items()
+                },
+                "endpoints": {
+                    endpoint: dict(counters, rate_limit_wait_seconds=round(counters["rate_limit_wait_seconds"], 3))
+                    for endpoint, counters in self.endpoints.items()
+                },
+                "edges": self.n_edges,
+                "edges_per_request": self.get_edges_per_request(),
+            }
+
+    def write_job_log(self, job_dir, script):
+        """
+        Append a record of this run to the job's JSON-lines metrics log.
+        """
+        with open(f"{job_dir}{METRICS_LOG_FNAME}", "a") as f:
+            f.write(json.dumps(self.to_dict(script)) + "\n")
+        return 0
+
+    def write_prometheus(self, script, dirname=""):
+        """
+        Write this run's metrics to `twitnet_<script>.prom` in the Prometheus text format, for node_exporter's textfile
+        collector (point it to `dirname`, by default the files folder). Values describe the last run, so they are gauges.
+        The file is replaced atomically, so the collector never reads a partial file.
+        """
+        data = self.to_dict(script)
+        labels = f'script="{script}"'
+        lines = [
+            "# HELP twitnet_last_run_timestamp_seconds Unix time at which the last run finished.",
+            "# TYPE twitnet_last_run_timestamp_seconds gauge",
+            f"twitnet_last_run_timestamp_seconds{{{labels}}} {time():.0f}",
+            "# HELP twitnet_last_run_duration_seconds Wall-clock duration of the last run.",
+            "# TYPE twitnet_last_run_duration_seconds gauge",
+            f"twitnet_last_run_duration_seconds{{{labels}}} {data['duration_seconds']}",
+            "# HELP twitnet_last_run_stage_seconds Seconds spent in each stage in the last run.",
+            "# TYPE twitnet_last_run_stage_seconds gauge",
+        ]
+        lines.extend(
+            f'twitnet_last_run_stage_seconds{{{labels},stage="{stage}"}} {totals["seconds"]}'
+            for stage, totals in data["stages"].items()
+        )
+        for name, help in (
+            ("requests", "API requests sent per endpoint in the last run."),
+            ("retries", "API requests retried per endpoint in the last run (rate-limited or revoked credential)."),
+            ("errors", "API requests failed per endpoint in the last run."),
+            ("rate_limit_wait_seconds", "Seconds waited for rate-limit windows per endpoint in the last run."),
+        ):
+            lines.append(f"# HELP twitnet_last_run_{name} {help}")
+            lines.append(f"# TYPE twitnet_last_run_{name} gauge")
+            lines.extend(
+                f'twitnet_last_run_{name}{{{labels},endpoint="{endpoint}"}} {counters[name]}'
+                for endpoint, counters in data["endpoints"].items()
+            )
+        lines.extend(
+            [
+                "# HELP twitnet_last_run_edges Edges collected in the last run.",
+                "# TYPE twitnet_last_run_edges gauge",
+                f"twitnet_last_run_edges{{{labels}}} {data['edges']}",
+            ]
+        )
+        if data["edges_per_request"] is not None:
+            lines.extend(
+                [
+                    "# HELP twitnet_last_run_edges_per_request Edges collected per friends/ids request in the last run.",
+                    "# TYPE twitnet_last_run_edges_per_request gauge",
+                    f"twitnet_last_run_edges_per_request{{{labels}}} {data['edges_per_request']}",
+                ]
+            )
+        dirname = dirname or f"{os.path.abspath(os.getcwd())}{FILES_FOLDER_NAME}"
+        fname = os.path.join(dirname, f"{PROMETHEUS_FNAME_PREFIX}{script}.prom")
+        with open(f"{fname}.tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(f"{fname}.tmp", fname)
+        return 0
+
+    def export(self, script, job_dirs=[]):
+        """
+        Write this run's metrics to the metrics log of each job it worked on and to the Prometheus textfile.
+        """
+        for job_dir in job_dirs:
+            self.write_job_log(job_dir, script)
+        self.write_prometheus(script)
+        print(
+            f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tSaved metrics of {script} run"
+        )
+        return 0
+
+
+# Shared by all modules of the process
+metrics = Metrics()
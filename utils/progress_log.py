@@ -0,0 +1,128 @@
+import csv
+import os
+from constants import EDGELIST_FAILED_FNAME, NEXT_CHUNK_START_FNAME, PROGRESS_LOG_FNAME
+from utils.edge_store import count_edges
+
+
+def load_next_chunk_start(job_dir):
+    """
+    Load the index of the next ID to explore, shared with process_chunk.py.
+    """
+    fname = f"{job_dir}{NEXT_CHUNK_START_FNAME}"
+    if not os.path.exists(fname):
+        return 0
+    with open(fname, "r") as f:
+        return int(f.readline())
+
+
+def save_next_chunk_start(job_dir, start):
+    """
+    Record the index of the next ID to explore, so that the crawl (or a cron tick) can resume from it.
+    """
+    with open(f"{job_dir}{NEXT_CHUNK_START_FNAME}", "w") as f:
+        f.write(str(start))
+    return 0
+
+
+class ProgressLog:
+    """
+    Write-ahead log of a job's crawl progress. Each line records a step for one ID of the ID list:
+    its index, ID, state ('start', 'partial', 'done' or 'failed'), next cursor and the number of edges
+    in edgelist.bin once the step's edges are written. Records are buffered and committed by the
+    EdgeWriter right after it flushes the matching edges, so a crash loses edges and progress together.
+    """
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.fname = f"{job_dir}{PROGRESS_LOG_FNAME}"
+        self.pending = []
+        # Index up to which all IDs are done or failed
+        self.committed = 0
+        # Indices done or failed out of order, after `committed`
+        self.done = set()
+        # Next cursor of partially explored IDs, by index
+        self.cursors = {}
+        self.n_edges = 0
+        if os.path.exists(self.fname):
+            self.replay()
+        else:
+            # Jobs started before the log existed resume from next_chunk_start.txt
+            self.committed = load_next_chunk_start(job_dir)
+            self.n_edges = count_edges(job_dir)
+            self.write([[self.committed, "", "start", 0, self.n_edges]])
+
+    def replay(self):
+        """
+        Rebuild progress from the log. A torn last line (from a crash while writing it) is discarded.
+        """
+        n_valid_bytes = 0
+        with open(self.fname, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    index, _, state, cursor, n_edges = next(csv.reader([line.decode()]))
+                    self.apply(int(index), state, int(cursor), int(n_edges))
+                except (ValueError, UnicodeDecodeError):
+                    break
+                n_valid_bytes += len(line)
+        if n_valid_bytes < os.path.getsize(self.fname):
+            os.truncate(self.fname, n_valid_bytes)
+        return 0
+
+    def apply(self, index, state, cursor, n_edges):
+        """
+        Apply one committed record to the progress state.
+        """
+        if state == "start":
+            self.committed = index
+        elif state == "partial":
+            self.cursors[index] = cursor
+        elif state in ("done", "failed"):
+            self.cursors.pop(index, None)
+            self.done.add(index)
+        else:
+            raise ValueError(f"Unknown state: {state}")
+        while self.committed in self.done:
+            self.done.remove(self.committed)
+            self.committed += 1
+        self.n_edges = n_edges
+        return 0
+
+    def is_done(self, index):
+        return index < self.committed or index in self.done
+
+    def record(self, index, id, state, cursor=0, error_message=""):
+        """
+        Buffer a step until the edges written before it are flushed.
+        """
+        self.pending.append((index, id, state, cursor, error_message))
+        return 0
+
+    def write(self, rows):
+        with open(self.fname, "a") as f:
+            csv.writer(f).writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        return 0
+
+    def commit(self, n_edges):
+        """
+        Commit buffered steps, given the number of edges now in edgelist.bin. Failed IDs are then
+        appended to edgelist_failed.csv, and next_chunk_start.txt is kept in sync for process_chunk.py.
+        The log is written first, so a crash in between can't make a replay explore and record a failed ID again.
+        """
+        if not self.pending:
+            return 0
+        self.write([[index, id, state, cursor, n_edges] for index, id, state, cursor, _ in self.pending])
+        failed = [[id, error_message] for _, id, state, _, error_message in self.pending if state == "failed"]
+        if failed:
+            with open(f"{self.job_dir}{EDGELIST_FAILED_FNAME}", "a") as f:
+                csv.writer(f).writerows(failed)
+                f.flush()
+                os.fsync(f.fileno())
+        for index, _, state, cursor, _ in self.pending:
+            self.apply(index, state, cursor, n_edges)
+        self.pending = []
+        save_next_chunk_start(self.job_dir, self.committed)
+        return 0
@@ -0,0 +1,157 @@
+import threading
+from time import sleep, time, gmtime, strftime
+from constants import RATE_LIMIT_WINDOW, RATE_LIMITS
+from utils.metrics import metrics
+
+# Endpoint of each tweepy.API method used by the app
+ENDPOINTS = {
+    "get_friend_ids": "friends/ids",
+    "get_user": "users/show",
+    "lookup_users": "users/lookup",
+    "search_tweets": "search/tweets",
+}
+
+# Twitter API error codes meaning that the credential itself can't be used anymore
+# (89: invalid or expired token, 326: account locked)
+REVOKED_ERROR_CODES = {89, 326}
+
+
+def get_clients(api):
+    """
+    Get the API clients behind `api`, which is either a single client (see utils.twitter_auth.get_twitter_api) or an ApiPool.
+    """
+    return getattr(api, "clients", [api])
+
+
+class SystemClock:
+    """
+    Wall clock used by the rate limiter. Benchmarks replace it with a virtual clock (see utils.fake_api).
+    """
+
+    def time(self):
+        return time()
+
+    def sleep(self, seconds):
+        sleep(seconds)
+
+
+class RateLimiter:
+    """
+    Token bucket per credential and endpoint. Buckets start full, are refilled when the rate-limit window resets,
+    and are corrected from the `x-rate-limit-*` headers of every API response. Safe to share between threads.
+    """
+
+    def __init__(self, limits=RATE_LIMITS, window=RATE_LIMIT_WINDOW, clock=None):
+        self.limits = dict(limits)
+        self.window = window
+        self.clock = clock or SystemClock()
+        self.buckets = {}
+        self.sent = {}
+        self.revoked = set()
+        self.lock = threading.RLock()
+
+    def get_bucket(self, endpoint, client=None):
+        """
+        Get the bucket of an endpoint for a client, refilling it if its window has reset.
+        """
+        now = self.clock.time()
+        key = (id(client), endpoint)
+        bucket = self.buckets.get(key)
+        if bucket is None or now >= bucket["reset"]:
+            bucket = {"remaining": self.limits[endpoint], "reset": now + self.window}
+            self.buckets[key] = bucket
+        return bucket
+
+    def get_remaining(self, endpoint, api=None):
+        """
+        Get the number of requests left in the current window of an endpoint, over all usable clients of `api`.
+        """
+        return sum(
+            self.get_bucket(endpoint, client)["remaining"]
+            for client in get_clients(api)
+            if id(client) not in self.revoked
+        )
+
+    def acquire(self, endpoint, api=None):
+        """
+        Take a token for one request from the usable client with the most requests left, sleeping until
+        the earliest window reset if all buckets are empty. Return the client to send the request with.
+        """
+        while True:
+            with self.lock:
+                clients = [client for client in get_clients(api) if id(client) not in self.revoked]
+                if not clients:
+                    raise Exception("All API credentials were revoked")
+                client = max(clients, key=lambda c: self.get_bucket(endpoint, c)["remaining"])
+                bucket = self.get_bucket(endpoint, client)
+                if bucket["remaining"] > 0:
+                    bucket["remaining"] -= 1
+                    self.sent[endpoint] = self.sent.get(endpoint, 0) + 1
+                    return client
+                wait = min(self.get_bucket(endpoint, c)["reset"] for c in clients) - self.clock.time() + 1
+            # Sleep without holding the lock, so other threads can use other endpoints
+            print(
+                f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tRate limit for {endpoint} reached, sleeping for {round(max(wait, 1))} s"
+            )
+            metrics.count(endpoint, "rate_limit_wait_seconds", max(wait, 1))
+            self.clock.sleep(max(wait, 1))
+
+    def update(self, endpoint, headers, client=None):
+        """
+        Update the bucket of an endpoint for a client from the rate-limit headers of an API response.
+        """
+        if headers is None or "x-rate-limit-remaining" not in headers:
+            return 0
+        with self.lock:
+            bucket = self.get_bucket(endpoint, client)
+            bucket["remaining"] = int(headers["x-rate-limit-remaining"])
+            if "x-rate-limit-reset" in headers:
+                bucket["reset"] = int(headers["x-rate-limit-reset"])
+            if "x-rate-limit-limit" in headers:
+                self.limits[endpoint] = int(headers["x-rate-limit-limit"])
+        return 0
+
+    def call(self, api, method_name, **kwargs):
+        """
+        Call a tweepy.API method as soon as the quota of its endpoint allows, spreading calls over the clients of an ApiPool.
+        Requests rejected with 429 are retried after the window resets, and requests rejected because
+        of a revoked credential are retried with another client.
+        """
+        endpoint = ENDPOINTS[method_name]
+        while True:
+            client = self.acquire(endpoint, api)
+            metrics.count(endpoint, "requests")
+            try:
+                with metrics.timer("api_call"):
+                    res = getattr(client, method_name)(**kwargs)
+            except Exception as e:
+                response = getattr(e, "response", None)
+                self.update(endpoint, getattr(response, "headers", None), client)
+                if getattr(response, "status_code", None) == 429:
+                    with self.lock:
+                        self.get_bucket(endpoint, client)["remaining"] = 0
+                    metrics.count(endpoint, "retries")
+                    continue
+                if REVOKED_ERROR_CODES.intersection(getattr(e, "api_codes", [])):
+                    print(
+                        f"{strftime('%Y-%m-%d %H:%M:%S', gmtime())}\tAPI credential revoked, retrying with another one"
+                    )
+                    self.revoked.add(id(client))
+                    metrics.count(endpoint, "retries")
+                    continue
+                metrics.count(endpoint, "errors")
+                raise
+            response = getattr(client, "last_response", None)
+            self.update(endpoint, getattr(response, "headers", None), client)
+            return res
+
+
+# Shared by all API calls of the process
+rate_limiter = RateLimiter()
+
+
+def call_api(api, method_name, **kwargs):
+    """
+    Call a tweepy.API method through the shared rate limiter. `api` can be a tweepy.API or an ApiPool.
+    """
+    return rate_limiter.call(api, method_name, **kwargs)
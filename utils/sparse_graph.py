@@ -0,0 +1,181 @@
+import math
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+from utils.metrics import metrics
+
+# Most memory taken by the distance matrix of a batch of BFS sources in exact diameter computation, in bytes
+BFS_MEMORY_BUDGET = 256 * 2**20
+
+
+class SparseGraph:
+    """
+    Directed graph stored as a CSR adjacency matrix over integer-coded nodes. `nodes[i]` is the Twitter ID of node i.
+    Metrics are vectorized with NumPy/SciPy instead of looping over Python objects like NetworkX.
+    """
+
+    def __init__(self, nodes, adjacency):
+        self.nodes = nodes
+        self.adjacency = adjacency
+
+    @classmethod
+    @metrics.timed("graph_build")
+    def from_edgelist(cls, edgelist):
+        """
+        Build a graph from a DataFrame with columns `source` and `target`. Duplicate edges are merged.
+        """
+        codes, nodes = pd.factorize(
+            np.concatenate([edgelist["source"].to_numpy(), edgelist["target"].to_numpy()])
+        )
+        n_edges = len(edgelist)
+        n_nodes = len(nodes)
+        adjacency = sp.csr_matrix(
+            (np.ones(n_edges, dtype=np.int8), (codes[:n_edges], codes[n_edges:])),
+            shape=(n_nodes, n_nodes),
+        )
+        adjacency.sum_duplicates()
+        adjacency.data[:] = 1
+        adjacency.sort_indices()
+        return cls(np.asarray(nodes), adjacency)
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return self.adjacency.nnz
+
+    def in_degree(self):
+        """
+        Return a Series of in-degrees indexed by node ID.
+        """
+        return pd.Series(self.adjacency.getnnz(axis=0), index=self.nodes)
+
+    def out_degree(self):
+        """
+        Return a Series of out-degrees indexed by node ID.
+        """
+        return pd.Series(self.adjacency.getnnz(axis=1), index=self.nodes)
+
+    def density(self):
+        n_nodes = self.number_of_nodes()
+        if n_nodes <= 1:
+            return 0
+        return self.number_of_edges() / (n_nodes * (n_nodes - 1))
+
+    def subgraph(self, mask):
+        """
+        Return the subgraph induced by the nodes selected with a boolean mask.
+        """
+        index = np.flatnonzero(mask)
+        return SparseGraph(self.nodes[index], self.adjacency[index][:, index].tocsr())
+
+    def largest_strongly_connected_component(self):
+        """
+        Return the subgraph of the largest strongly connected component.
+        """
+        _, labels = csgraph.connected_components(self.adjacency, directed=True, connection="strong")
+        largest = np.bincount(labels).argmax()
+        return self.subgraph(labels == largest)
+
+    def without_self_loops(self):
+        """
+        Return the adjacency matrix without self-loops.
+        """
+        adjacency = self.adjacency.tocoo()
+        keep = adjacency.row != adjacency.col
+        return sp.csr_matrix(
+            (adjacency.data[keep], (adjacency.row[keep], adjacency.col[keep])),
+            shape=adjacency.shape,
+        )
+
+    def transitivity(self):
+        """
+        Compute transitivity with the same definition as nx.transitivity on a DiGraph: the fraction of
+        wedges (ordered pairs of distinct successors w, x of a node) where x is a successor of w.
+        """
+        adjacency = self.without_self_loops().astype(np.int64)
+        out_degree = np.asarray(adjacency.getnnz(axis=1), dtype=np.int64)
+        n_wedges = (out_degree * (out_degree - 1)).sum()
+        if n_wedges == 0:
+            return 0
+        n_closed = (adjacency @ adjacency).multiply(adjacency).sum()
+        return float(n_closed / n_wedges)
+
+    def sample_transitivity(self, n_samples=10000, seed=0):
+        """
+        Estimate transitivity by sampling wedges. Return a tuple of (estimate, half-width of its 95% confidence interval).
+        """
+        rng = np.random.default_rng(seed)
+        adjacency = self.without_self_loops()
+        adjacency.sort_indices()
+        out_degree = np.diff(adjacency.indptr).astype(np.float64)
+        weights = out_degree * (out_degree - 1)
+        if weights.sum() == 0:
+            return 0.0, 0.0
+        centers = rng.choice(len(weights), size=n_samples, p=weights / weights.sum())
+        degree = out_degree[centers].astype(np.int64)
+        # Pick two distinct successors of each center
+        first = rng.integers(0, degree)
+        second = rng.integers(0, degree - 1)
+        second = second + (second >= first)
+        w = adjacency.indices[adjacency.indptr[centers] + first]
+        x = adjacency.indices[adjacency.indptr[centers] + second]
+        closed = np.asarray(adjacency[w, x]).ravel() > 0
+        p = float(closed.mean())
+        return p, 1.96 * math.sqrt(p * (1 - p) / n_samples)
+
+    def bfs_distances(self, sources, reverse=False):
+        """
+        Return a (len(sources), n) array of hop distances from each source (np.inf where unreachable).
+        With reverse=True, distances are measured along reversed edges, i.e. to each source.
+        """
+        adjacency = self.adjacency.T.tocsr() if reverse else self.adjacency
+        return csgraph.shortest_path(adjacency, directed=True, unweighted=True, indices=sources)
+
+    def diameter(self):
+        """
+        Compute the exact diameter (the largest eccentricity) with a BFS from every node, in batches
+        whose (batch size, n) float64 distance matrix fits in BFS_MEMORY_BUDGET. The graph must be strongly connected.
+        """
+        n_nodes = self.number_of_nodes()
+        batch_size = max(1, BFS_MEMORY_BUDGET // (8 * n_nodes))
+        diameter = 0
+        for start in range(0, n_nodes, batch_size):
+            sources = np.arange(start, min(start + batch_size, n_nodes))
+            diameter = max(diameter, self.bfs_distances(sources).max())
+        return int(diameter)
+
+    def approximate_diameter(self, n_sweeps=4, seed=0):
+        """
+        Bound the diameter of a strongly connected graph with repeated double sweeps, like
+        utils.graph_stats.approximate_diameter. Return a tuple of (lower bound, upper bound).
+        """
+        rng = np.random.default_rng(seed)
+        lower = 0
+        upper = math.inf
+        start = rng.integers(self.number_of_nodes())
+        for _ in range(n_sweeps):
+            dist = self.bfs_distances([start])[0]
+            dist_in = self.bfs_distances([start], reverse=True)[0]
+            farthest = dist.argmax()
+            upper = min(upper, int(dist.max() + dist_in.max()))
+            lower = max(lower, int(dist.max()), int(dist_in.max()))
+            dist_farthest = self.bfs_distances([farthest])[0]
+            lower = max(lower, int(dist_farthest.max()))
+            if lower == upper:
+                break
+            start = dist_farthest.argmax()
+        return lower, upper
+
+    def to_networkx(self):
+        """
+        Export the graph as a NetworkX DiGraph with Twitter IDs as nodes.
+        """
+        import networkx as nx
+
+        G = nx.DiGraph()
+        G.add_nodes_from(self.nodes.tolist())
+        adjacency = self.adjacency.tocoo()
+        G.add_edges_from(zip(self.nodes[adjacency.row].tolist(), self.nodes[adjacency.col].tolist()))
+        return G
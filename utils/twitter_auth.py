@@ -1,21 +1,82 @@
 import json
 import os
-import tweepy
-
+import threading
 from constants import CONFIG_FOLDER_NAME, TWITTER_AUTH_FNAME
 
 
+class ApiPool:
+    """
+    Pool of tweepy.API clients, one per bearer token. API calls made through utils.rate_limit.call_api
+    are spread over the clients according to each token's remaining quota.
+    """
+
+    def __init__(self, clients):
+        self.clients = clients
+
+
+class ThreadLocalApi:
+    """
+    tweepy.API for one bearer token, with a separate client in each thread. tweepy.API keeps the last response and its
+    HTTP session on the client, so threads sharing one (e.g. in crawl.py's async mode) would read each other's
+    rate-limit headers and close each other's sessions. Rate-limit buckets are kept per ThreadLocalApi, i.e. per token.
+    """
+
+    def __init__(self, make_client):
+        self.make_client = make_client
+        self.local = threading.local()
+
+    def get_client(self):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.make_client()
+        return client
+
+    def __getattr__(self, name):
+        # Only called for attributes not set in __init__, i.e. tweepy.API methods and attributes like last_response
+        return getattr(self.get_client(), name)
+
+
+# Returned by get_twitter_api instead of a tweepy client when set, e.g. a utils.fake_api.FakeTwitterAPI
+_api_override = None
+
+
+def set_twitter_api(api):
+    """
+    Make get_twitter_api return `api` instead of building a tweepy client, so the app can run offline. Pass None to undo.
+    """
+    global _api_override
+    _api_override = api
+    return 0
+
+
+def load_bearer_tokens():
+    """
+    Load bearer tokens from the config file, which holds either one `bearer_token` or a list of `bearer_tokens`.
+    """
+    with open(f"{os.path.abspath(os.getcwd())}{CONFIG_FOLDER_NAME}{TWITTER_AUTH_FNAME}", "r") as f:
+        config = json.load(f)
+    return config.get("bearer_tokens") or [config["bearer_token"]]
+
+
 def get_twitter_api(bearer_token=""):
     """
     Get the tweepy API object using the bearer token from a Twitter developer account.
+    If no token is given and the config file holds several, return an ApiPool with a client per token.
     """
+    if _api_override is not None and not bearer_token:
+        return _api_override
+    # Imported on first use, as it takes a large share of the start-up time of short crawl runs
+    import tweepy
+
     if int(tweepy.__version__.split(".")[0]) < 4:
         print(f"Please update tweepy to v4. Your current version is: {tweepy.__version__}")
     if not bearer_token:
-        # Load bearer token from config file
-        with open(f"{os.path.abspath(os.getcwd())}{CONFIG_FOLDER_NAME}{TWITTER_AUTH_FNAME}", "r") as f:
-            bearer_token = json.load(f)["bearer_token"]
+        # Load bearer token(s) from config file
+        bearer_tokens = load_bearer_tokens()
+        if len(bearer_tokens) > 1:
+            return ApiPool([get_twitter_api(bearer_token=token) for token in bearer_tokens])
+        bearer_token = bearer_tokens[0]
     # Authenticate to Twitter API v1.1
     auth = tweepy.OAuth2BearerHandler(bearer_token)
-    api = tweepy.API(auth)
-    return api
\ No newline at end of file
+    api = ThreadLocalApi(lambda: tweepy.API(auth))
+    return api